@@ -0,0 +1,286 @@
+import argparse
+import json
+import os
+import time
+
+import openai
+
+import matchMakingAlgorithm
+import openaiClient
+import scoring
+
+# The Batch API accepts at most 50,000 requests per input file
+MAX_REQUESTS_PER_BATCH = 50000
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+class OpenAIBatchBackend:
+    """
+    Batch backend using the OpenAI Files and Batches APIs.
+
+    Pass base_url (or OPENAI_BATCH_BASE_URL) to run against a local stand-in
+    server instead of api.openai.com. Any object with the same four methods
+    can be used as a backend.
+    """
+
+    def __init__(self, client=None, base_url: str = None):
+        self.client = client or openai.OpenAI(
+            api_key=matchMakingAlgorithm.OPENAI_API_KEY,
+            base_url=base_url or os.getenv("OPENAI_BATCH_BASE_URL")
+        )
+
+    def upload(self, path: str) -> str:
+        with open(path, "rb") as f:
+            return self.client.files.create(file=f, purpose="batch").id
+
+    def submit(self, input_file_id: str) -> str:
+        batch = self.client.batches.create(
+            input_file_id=input_file_id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window="24h"
+        )
+        return batch.id
+
+    def status(self, batch_id: str) -> dict:
+        batch = self.client.batches.retrieve(batch_id)
+        return {
+            "status": batch.status,
+            "output_file_id": batch.output_file_id,
+            "error_file_id": batch.error_file_id
+        }
+
+    def download(self, file_id: str) -> str:
+        return self.client.files.content(file_id).text
+
+
+# Function to build the batch request line for one attribute comparison
+def build_request(custom_id: str, attribute: str, value_1: str, value_2: str) -> dict:
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": BATCH_ENDPOINT,
+        "body": {
+            "model": matchMakingAlgorithm.OPENAI_MODEL,
+            "messages": [{
+                "role": "system",
+                "content": matchMakingAlgorithm.MATCHMAKING_SYSTEM_PROMPT
+            }, {
+                "role": "user",
+                "content": json.dumps({"Person 1": value_1, "Person 2": value_2})
+            }],
+            "response_format": {
+                "type": "json_schema",
+                "json_schema": matchMakingAlgorithm.MATCHMAKING_SCORE_SCHEMA
+            }
+        }
+    }
+
+
+# Function to collect the distinct attribute value pairs for a set of parsed Profile pairs
+def collect_pairs(profile_pairs, score_store, attributes=scoring.ATTRIBUTES, force: bool = False) -> list:
+    pairs = {}
+    for profile, other_profile in profile_pairs:
+        for attribute in attributes:
+            key = score_store.key(attribute, profile.get(attribute), other_profile.get(attribute))
+            if key in pairs:
+                continue
+            if force or key not in score_store:
+                pairs[key] = True
+    return list(pairs)
+
+
+# Function to yield the (Profile, candidate Profile) pairs the LLM rerank would score: every user's local shortlist
+def shortlist_pairs(all_users: list, pool: int = matchMakingAlgorithm.MATCH_RERANK_POOL):
+    parsed = {user['UserID']: matchMakingAlgorithm.parse_profile(user) for user in all_users}
+    matchMakingAlgorithm.sync_candidates(None, parsed.values())
+    for user in all_users:
+        # Cached weights are reused; anything new is generated at bulk priority
+        weights = matchMakingAlgorithm.generate_dynamic_weights(user, priority=openaiClient.BULK)
+        profile = parsed[user['UserID']]
+        for candidate_id, _ in matchMakingAlgorithm.rank_candidates(profile, weights, pool):
+            yield profile, parsed[candidate_id]
+
+
+class BulkScoringJob:
+    """
+    Offline pairwise scoring through a Batch-style job.
+
+    Pairs are written as JSONL chunks in workdir, uploaded, submitted and
+    polled until the batch finishes; results are loaded into the pairwise
+    score store. Progress is checkpointed after every step, so re-running
+    the job after a crash resumes where it stopped instead of resubmitting.
+    """
+
+    def __init__(self, workdir: str, backend=None, score_store=None, poll_interval: float = 60):
+        self.workdir = workdir
+        self.backend = backend or OpenAIBatchBackend()
+        self.score_store = score_store if score_store is not None else matchMakingAlgorithm.pair_scores
+        self.poll_interval = poll_interval
+        self.checkpoint_path = os.path.join(workdir, "checkpoint.json")
+        os.makedirs(workdir, exist_ok=True)
+
+    def _load_checkpoint(self):
+        if not os.path.exists(self.checkpoint_path):
+            return None
+        with open(self.checkpoint_path) as f:
+            return json.load(f)
+
+    def _save_checkpoint(self, state: dict):
+        with open(f"{self.checkpoint_path}.tmp", "w") as f:
+            json.dump(state, f, indent=2)
+        os.replace(f"{self.checkpoint_path}.tmp", self.checkpoint_path)
+
+    # Function to write the request JSONL (and the pair list it maps back to) for each chunk
+    def prepare(self, pairs: list) -> dict:
+        chunks = []
+        for number, start in enumerate(range(0, len(pairs), MAX_REQUESTS_PER_BATCH)):
+            chunk_pairs = pairs[start:start + MAX_REQUESTS_PER_BATCH]
+            input_path = os.path.join(self.workdir, f"chunk-{number}.jsonl")
+            pairs_path = os.path.join(self.workdir, f"chunk-{number}.pairs.json")
+
+            with open(input_path, "w") as f:
+                for index, (attribute, value_1, value_2) in enumerate(chunk_pairs):
+                    f.write(json.dumps(build_request(f"{number}-{index}", attribute, value_1, value_2)) + "\n")
+            with open(pairs_path, "w") as f:
+                json.dump(chunk_pairs, f)
+
+            chunks.append({
+                "number": number,
+                "input_path": input_path,
+                "pairs_path": pairs_path,
+                "stage": "prepared"
+            })
+
+        state = {"created_at": time.time(), "chunks": chunks}
+        self._save_checkpoint(state)
+        print(f"Prepared {len(pairs)} scoring requests in {len(chunks)} batch file(s)")
+        return state
+
+    def _load_results(self, chunk: dict, output: str) -> int:
+        with open(chunk["pairs_path"]) as f:
+            pairs = json.load(f)
+
+        loaded = 0
+        for line in output.splitlines():
+            if not line.strip():
+                continue
+            try:
+                result = json.loads(line)
+                index = int(result["custom_id"].split("-")[1])
+                body = result["response"]["body"]
+                score = json.loads(body["choices"][0]["message"]["content"])["compatibility_score"]
+                self.score_store.set(*pairs[index], score)
+                loaded += 1
+            except (json.JSONDecodeError, KeyError, IndexError, TypeError, ValueError) as e:
+                print(f"Error decoding batch result line: {e}")
+        return loaded
+
+    # Function to summarise a batch error file as (failed request count, first error message)
+    def _read_errors(self, file_id: str):
+        lines = [line for line in self.backend.download(file_id).splitlines() if line.strip()]
+        first = None
+        if lines:
+            try:
+                result = json.loads(lines[0])
+                error = result.get("error") or (result.get("response") or {}).get("body", {}).get("error") or {}
+                first = error.get("message") if isinstance(error, dict) else str(error)
+            except (json.JSONDecodeError, AttributeError):
+                first = lines[0][:200]
+        return len(lines), first
+
+    def _advance(self, chunk: dict, state: dict):
+        if chunk["stage"] == "prepared":
+            chunk["input_file_id"] = self.backend.upload(chunk["input_path"])
+            chunk["stage"] = "uploaded"
+            self._save_checkpoint(state)
+
+        if chunk["stage"] == "uploaded":
+            chunk["batch_id"] = self.backend.submit(chunk["input_file_id"])
+            chunk["stage"] = "submitted"
+            self._save_checkpoint(state)
+            print(f"Submitted batch {chunk['batch_id']} for chunk {chunk['number']}")
+
+        if chunk["stage"] == "submitted":
+            status = self.backend.status(chunk["batch_id"])
+            if status["status"] not in TERMINAL_STATUSES:
+                return
+            chunk["batch_status"] = status["status"]
+            chunk["output_file_id"] = status["output_file_id"]
+            chunk["error_file_id"] = status.get("error_file_id")
+            chunk["stage"] = "finished"
+            self._save_checkpoint(state)
+
+        if chunk["stage"] == "finished":
+            loaded = 0
+            if chunk["output_file_id"]:
+                loaded = self._load_results(chunk, self.backend.download(chunk["output_file_id"]))
+            if not self.score_store.save():
+                # Leave the chunk at "finished" so a re-run loads it again
+                raise RuntimeError(f"Could not persist pairwise scores to {self.score_store.path!r}")
+            chunk["loaded"] = loaded
+            if chunk.get("error_file_id"):
+                chunk["errors"], chunk["first_error"] = self._read_errors(chunk["error_file_id"])
+                print(f"Batch {chunk['batch_id']} had {chunk['errors']} failed requests, e.g.: {chunk['first_error']}")
+
+            # A failed, expired or cancelled batch is reported, not counted as done
+            chunk["stage"] = "loaded" if chunk["batch_status"] == "completed" else "failed"
+            self._save_checkpoint(state)
+            print(f"Loaded {loaded} scores from batch {chunk['batch_id']} ({chunk['batch_status']})")
+
+    def run(self, pairs: list = None) -> dict:
+        """
+        Run (or resume) the job until every chunk's results are loaded.
+
+        Raises RuntimeError if a batch ended failed, expired or cancelled (whatever
+        results it did return are still loaded).
+
+        Parameters:
+        - pairs: (attribute, value 1, value 2) tuples to score. Ignored when a checkpoint exists.
+        """
+        state = self._load_checkpoint()
+        if state is None:
+            state = self.prepare(pairs or [])
+        else:
+            print(f"Resuming bulk scoring job from {self.checkpoint_path}")
+
+        while True:
+            for chunk in state["chunks"]:
+                self._advance(chunk, state)
+
+            if all(chunk["stage"] in ("loaded", "failed") for chunk in state["chunks"]):
+                break
+            time.sleep(self.poll_interval)
+
+        failed = [chunk for chunk in state["chunks"] if chunk["stage"] == "failed"]
+        if failed:
+            raise RuntimeError(
+                f"{len(failed)} of {len(state['chunks'])} batch(es) did not complete: "
+                + ", ".join(f"{chunk['batch_id']} ({chunk['batch_status']}: {chunk.get('first_error')})" for chunk in failed)
+            )
+        return state
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk pairwise scoring through the OpenAI Batch API")
+    parser.add_argument("--workdir", required=True, help="Directory for batch files and the checkpoint")
+    parser.add_argument("--rescore", action="store_true", help="Re-score every pair already in the score store (e.g. after a prompt change)")
+    parser.add_argument("--pool", type=int, default=matchMakingAlgorithm.MATCH_RERANK_POOL, help="Candidates per user to pre-score (the rerank shortlist size)")
+    parser.add_argument("--poll-interval", type=float, default=60)
+    args = parser.parse_args()
+
+    if not matchMakingAlgorithm.pair_scores.path:
+        parser.error("PAIR_SCORE_PATH must be set, or the scores are lost when the job exits")
+
+    job = BulkScoringJob(args.workdir, poll_interval=args.poll_interval)
+    pairs = None
+    if not os.path.exists(job.checkpoint_path):
+        if args.rescore:
+            pairs = job.score_store.keys()
+        else:
+            table = matchMakingAlgorithm.dynamodb.Table('UserProfiles')
+            profiles = matchMakingAlgorithm.get_all_user_profiles(table) or []
+            pairs = collect_pairs(shortlist_pairs(profiles, args.pool), job.score_store)
+
+    job.run(pairs)
@@ -0,0 +1,193 @@
+"""
+Offline benchmark for main.app and matchMakingAlgorithm.
+
+Runs everything against local stand-ins: an in-process DynamoDB
+(bench/fakes.py, patched over boto3.resource before main is imported), a
+fake OpenAI client, and one local HTTP server playing both the Heart API
+and schat (bench/fakeServer.py). Each fake has a configurable latency.
+
+Usage:
+    python bench/bench.py
+    python bench/bench.py --requests 2000 --concurrency 64 --sizes 100,1000,10000,100000
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import time
+import uuid
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import boto3
+import httpx
+
+from fakes import FakeDynamoResource, FakeOpenAI, FakeTable, fake_profiles
+from fakeServer import FakeServer, FakeServiceState
+
+
+def percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+# Function to start the fakes and import main against them
+def install_fakes(args):
+    server = FakeServer(FakeServiceState(latency=args.heart_latency, schat_latency=args.schat_latency)).start()
+    os.environ.update({
+        "AWS_DEFAULT_REGION": "us-east-1",
+        "HEART_API_URL": server.url,
+        "HEART_BEARER_TOKEN": "bench",
+        "SCHAT_URL": server.host,
+        "ADMIN_ID": "admin",
+        "OPENAI_API_KEY": "bench",
+        "SCHAT_STREAMING": "true" if args.streaming else "false"
+    })
+
+    dynamodb = FakeDynamoResource(latency=args.dynamo_latency)
+    boto3.resource = lambda *args, **kwargs: dynamodb
+
+    import main
+    openai = FakeOpenAI(latency=args.openai_latency)
+    main.matchMakingAlgorithm.openai = openai
+    return main, dynamodb, server, openai
+
+
+async def bench_process_message(main, dynamodb, server, args) -> dict:
+    dynamodb.Table('UserProfiles').seed(fake_profiles(args.users))
+    await main.startup()
+
+    latencies = []
+    first_messages = []
+    failures = 0
+    pending = iter(range(args.requests))
+
+    async def worker(client):
+        nonlocal failures
+        for number in pending:
+            user = f"user-{number % args.users}"
+            body = {"senderUserID": user, "chatID": f"chat-{user}", "chatMessageID": str(uuid.uuid4())}
+            start = time.perf_counter()
+            response = await client.post("/process_message", json=body)
+            latencies.append(time.perf_counter() - start)
+
+            # Time until the user saw the first direct message of the reply
+            with server.state._lock:
+                sent = [at for at in server.state.direct_messages.get(user, []) if at >= start]
+            if sent:
+                first_messages.append(min(sent) - start)
+            if response.status_code != 200:
+                failures += 1
+
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench") as client:
+            started = time.perf_counter()
+            await asyncio.gather(*[worker(client) for _ in range(args.concurrency)])
+            elapsed = time.perf_counter() - started
+    finally:
+        await main.shutdown()
+
+    return {
+        "requests": len(latencies),
+        "failures": failures,
+        "concurrency": args.concurrency,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "first_message_p50_ms": percentile(first_messages, 0.50) * 1000,
+        "first_message_p99_ms": percentile(first_messages, 0.99) * 1000
+    }
+
+
+def bench_matchmaking(main, sizes: list, repeats: int) -> list:
+    import candidateIndex
+    import embeddingIndex
+    import profileStore
+    import scoring
+
+    matchmaker = main.matchMakingAlgorithm
+    results = []
+    for size in sizes:
+        table = FakeTable('UserProfiles')
+        table.seed(fake_profiles(size, seed=size))
+
+        # Start every size from empty indexes, as a freshly started process would
+        matchmaker.profile_matrix = scoring.ProfileMatrix()
+        matchmaker.candidate_index = candidateIndex.CandidateIndex()
+        matchmaker.embedding_index = embeddingIndex.EmbeddingIndex()
+        matchmaker._attached_store = None
+        store = profileStore.ProfileStore(table)
+
+        start = time.perf_counter()
+        matchmaker.run_matchmaking_algorithm("user-0", store)
+        cold = time.perf_counter() - start
+
+        warm = []
+        for number in range(1, repeats + 1):
+            start = time.perf_counter()
+            matchmaker.run_matchmaking_algorithm(f"user-{number % size}", store)
+            warm.append(time.perf_counter() - start)
+
+        results.append({
+            "profiles": size,
+            "cold_ms": cold * 1000,
+            "warm_p50_ms": percentile(warm, 0.50) * 1000,
+            "warm_max_ms": max(warm) * 1000 if warm else 0.0
+        })
+    return results
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Benchmark /process_message and matchmaking against local fakes")
+    parser.add_argument("--only", choices=["process_message", "matchmaking"], help="Run a single benchmark")
+    parser.add_argument("--requests", type=int, default=500, help="/process_message requests to send")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent /process_message clients")
+    parser.add_argument("--users", type=int, default=1000, help="Profiles seeded for the /process_message run")
+    parser.add_argument("--sizes", default="100,1000,10000,100000", help="Comma-separated profile counts for matchmaking")
+    parser.add_argument("--repeats", type=int, default=5, help="Warm matchmaking runs per size")
+    parser.add_argument("--dynamo-latency", type=float, default=0.005, help="Seconds per fake DynamoDB call")
+    parser.add_argument("--heart-latency", type=float, default=0.02, help="Seconds per fake Heart API call")
+    parser.add_argument("--schat-latency", type=float, default=0.2, help="Seconds per fake schat /chat/ call")
+    parser.add_argument("--openai-latency", type=float, default=0.3, help="Seconds per fake OpenAI call")
+    parser.add_argument("--streaming", action="store_true", help="Run with SCHAT_STREAMING enabled")
+    parser.add_argument("--json", help="Also write the results to this file")
+    parser.add_argument("--verbose", action="store_true", help="Keep the app's own log output")
+    args = parser.parse_args()
+
+    results = {"settings": vars(args)}
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+    with quiet:
+        main, dynamodb, server, openai = install_fakes(args)
+        try:
+            if args.only in (None, "process_message"):
+                results["process_message"] = asyncio.run(bench_process_message(main, dynamodb, server, args))
+            if args.only in (None, "matchmaking"):
+                sizes = [int(size) for size in args.sizes.split(",") if size]
+                results["matchmaking"] = bench_matchmaking(main, sizes, args.repeats)
+        finally:
+            server.stop()
+    results["fake_openai_calls"] = openai.calls
+
+    if "process_message" in results:
+        run = results["process_message"]
+        print(f"/process_message: {run['requests']} requests ({run['failures']} failed), concurrency {run['concurrency']}")
+        print(f"  {run['rps']:.1f} req/s, p50 {run['p50_ms']:.1f} ms, p99 {run['p99_ms']:.1f} ms")
+        print(f"  first reply message: p50 {run['first_message_p50_ms']:.1f} ms, p99 {run['first_message_p99_ms']:.1f} ms")
+    if "matchmaking" in results:
+        print("matchmaking:")
+        print(f"  {'profiles':>9} {'cold ms':>10} {'warm p50 ms':>12} {'warm max ms':>12}")
+        for run in results["matchmaking"]:
+            print(f"  {run['profiles']:>9} {run['cold_ms']:>10.1f} {run['warm_p50_ms']:>12.1f} {run['warm_max_ms']:>12.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,167 @@
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Chat message every fake user has just sent, unless a chat's message is set explicitly
+DEFAULT_MESSAGE = "<p>I love hiking and cooking, looking for something long-term</p>"
+
+
+class FakeServiceState:
+    """
+    State shared by the fake Heart API and schat endpoints.
+    """
+
+    def __init__(self, latency: float = 0.0, schat_latency: float = None, message: str = DEFAULT_MESSAGE):
+        self.latency = latency
+        self.schat_latency = latency if schat_latency is None else schat_latency
+        self.message = message
+        self.messages = {}
+        self.categories = {}
+        self.requests = 0
+        self.direct_messages = {}
+        self._lock = threading.Lock()
+
+    # Function to set the latest message the fake Heart API reports for a chat
+    def set_message(self, chat_id: str, text: str):
+        with self._lock:
+            self.messages[chat_id] = text
+
+    def chat_reply(self, user_message: str) -> dict:
+        return {
+            "assistant_response": "Les go!! 🌈 That sounds wonderful. What do you enjoy cooking the most? Do you hike nearby? 💕",
+            "user_profile": {
+                "interests": user_message[:200],
+                "relationship_goals": "long-term relationship",
+                "location": "Boston"
+            }
+        }
+
+
+def _handler(state: FakeServiceState):
+    class Handler(BaseHTTPRequestHandler):
+        # Keep-alive, so connection pooling in the app behaves as it would in production
+        protocol_version = "HTTP/1.1"
+        # Headers and body go out in separate writes; don't let Nagle hold the body back
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+        def _reply(self, body, status: int = 200):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _stream(self, reply: dict, latency: float, chunks: int = 8):
+            # Newline-delimited JSON deltas spread over the generation time, then the final reply
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            text = reply["assistant_response"]
+            size = -(-len(text) // chunks)
+            lines = [{"delta": text[start:start + size]} for start in range(0, len(text), size)] + [reply]
+            for line in lines:
+                time.sleep(latency / len(lines))
+                data = (json.dumps(line) + "\n").encode("utf-8")
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+
+        def _body(self) -> dict:
+            length = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(length) or b"{}") if length else {}
+
+        def _handle(self, method: str):
+            body = self._body()
+            path = self.path.split("?")[0]
+            with state._lock:
+                state.requests += 1
+
+            if method == "POST" and path == "/chat/":
+                time.sleep(state.schat_latency)
+                return self._reply(state.chat_reply(body.get("user_message", "")))
+            if method == "POST" and path == "/chat/stream":
+                return self._stream(state.chat_reply(body.get("user_message", "")), state.schat_latency)
+
+            time.sleep(state.latency)
+            user = re.fullmatch(r"/v0/users/([^/]+)", path)
+            if method == "GET" and user:
+                user_id = user.group(1)
+                return self._reply({"id": user_id, "email": f"{user_id}@example.com", "name": user_id})
+
+            messages = re.fullmatch(r"/v0/directMessages/([^/]+)", path)
+            if method == "GET" and messages:
+                with state._lock:
+                    text = state.messages.get(messages.group(1), state.message)
+                return self._reply([{"content": "<p>Hi!</p>"}, {"content": text}])
+
+            if path == "/v0/channelCategories":
+                with state._lock:
+                    if method == "GET":
+                        return self._reply([{"id": category_id, "name": name} for name, category_id in state.categories.items()])
+                    category_id = state.categories.setdefault(body.get("name"), str(uuid.uuid4()))
+                return self._reply({"id": category_id})
+
+            if method == "PUT" and path == "/v0/channels":
+                return self._reply({"channelID": str(uuid.uuid4())})
+
+            if method == "PUT" and path == "/v0/directMessages":
+                with state._lock:
+                    state.direct_messages.setdefault(body.get("to"), []).append(time.perf_counter())
+                return self._reply({"messageID": str(uuid.uuid4())})
+
+            if method == "PUT" and re.fullmatch(r"/v0/chatChannel/[^/]+/message", path):
+                return self._reply({"messageID": str(uuid.uuid4())})
+
+            return self._reply({"error": f"No fake for {method} {path}"}, status=404)
+
+        def do_GET(self):
+            self._handle("GET")
+
+        def do_PUT(self):
+            self._handle("PUT")
+
+        def do_POST(self):
+            self._handle("POST")
+
+    return Handler
+
+
+class FakeServer:
+    """
+    Local HTTP server standing in for both the Heart API and the schat service.
+
+    Point HEART_API_URL at `url` and SCHAT_URL at `host`.
+    """
+
+    def __init__(self, state: FakeServiceState = None, host: str = "127.0.0.1", port: int = 0):
+        self.state = state or FakeServiceState()
+        self._server = ThreadingHTTPServer((host, port), _handler(self.state))
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def host(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"{host}:{port}"
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
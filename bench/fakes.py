@@ -0,0 +1,326 @@
+import copy
+import json
+import random
+import threading
+import time
+import uuid
+import zlib
+from types import SimpleNamespace
+
+from botocore.exceptions import ClientError
+
+# Key attributes of the tables the app uses; other tables are keyed on whichever of
+# these attributes the item has
+KEY_SCHEMAS = {
+    'ChatMessages': ('ChatID', 'Timestamp'),
+    'UserProfiles': ('UserID',)
+}
+_FALLBACK_KEYS = ('SessionKey', 'ProfileHash', 'UserID')
+
+# Items returned per scan page, standing in for DynamoDB's 1 MB page limit
+SCAN_PAGE_ITEMS = 1000
+
+
+def _evaluate(condition, item: dict) -> bool:
+    """
+    Evaluate a boto3 Key/Attr condition against an item.
+    """
+    if condition is None:
+        return True
+    expression = condition.get_expression()
+    operator = expression['operator']
+    values = expression['values']
+
+    if operator == 'AND':
+        return _evaluate(values[0], item) and _evaluate(values[1], item)
+    if operator == 'OR':
+        return _evaluate(values[0], item) or _evaluate(values[1], item)
+    if operator == 'NOT':
+        return not _evaluate(values[0], item)
+    if operator == 'attribute_exists':
+        return values[0].name in item
+    if operator == 'attribute_not_exists':
+        return values[0].name not in item
+
+    name = values[0].name
+    if name not in item:
+        return False
+    value = item[name]
+    if operator == '=':
+        return value == values[1]
+    if operator == '<>':
+        return value != values[1]
+    if operator == '<':
+        return value < values[1]
+    if operator == '<=':
+        return value <= values[1]
+    if operator == '>':
+        return value > values[1]
+    if operator == '>=':
+        return value >= values[1]
+    if operator == 'BETWEEN':
+        return values[1] <= value <= values[2]
+    if operator == 'begins_with':
+        return str(value).startswith(values[1])
+    raise NotImplementedError(f"Condition operator {operator} is not supported by the fake table")
+
+
+def _project(item: dict, projection: str, names: dict) -> dict:
+    if not projection:
+        return item
+    attributes = [names.get(part.strip(), part.strip()) for part in projection.split(',')]
+    return {attribute: item[attribute] for attribute in attributes if attribute in item}
+
+
+class FakeBatchWriter:
+    def __init__(self, table, overwrite_by_pkeys=None):
+        self.table = table
+        self._items = {}
+
+    def __enter__(self):
+        return self
+
+    def put_item(self, Item):
+        self._items[self.table._key(Item)] = Item
+
+    def delete_item(self, Key):
+        self._items[self.table._key(Key)] = None
+
+    def __exit__(self, *exc_info):
+        items = list(self._items.items())
+        # One BatchWriteItem round trip per 25 items
+        for start in range(0, len(items), 25):
+            self.table._sleep()
+            with self.table._lock:
+                for key, item in items[start:start + 25]:
+                    if item is None:
+                        self.table._items.pop(key, None)
+                    else:
+                        self.table._items[key] = copy.deepcopy(item)
+                self.table._version += 1
+        return False
+
+
+class FakeTable:
+    """
+    In-memory stand-in for a boto3 DynamoDB Table.
+
+    Supports the calls the app makes (get/put/delete_item, query, segmented
+    scan with filters, projections and Select=COUNT, batch_writer) and sleeps
+    `latency` seconds per round trip.
+    """
+
+    def __init__(self, name: str, latency: float = 0.0):
+        self.name = name
+        self.latency = latency
+        self._items = {}
+        self._lock = threading.Lock()
+        self._version = 0
+        self._segments = None
+
+    def __len__(self):
+        return len(self._items)
+
+    def _segment_keys(self, segment: int, total_segments: int) -> list:
+        # Split the keys into scan segments once per table version, not once per page
+        if self._segments is None or self._segments[:2] != (self._version, total_segments):
+            segments = [[] for _ in range(total_segments)]
+            for key in self._items:
+                segments[zlib.crc32(repr(key).encode()) % total_segments].append(key)
+            self._segments = (self._version, total_segments, segments)
+        return self._segments[2][segment]
+
+    def _sleep(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _key_names(self, item: dict) -> tuple:
+        if self.name in KEY_SCHEMAS:
+            return KEY_SCHEMAS[self.name]
+        for name in _FALLBACK_KEYS:
+            if name in item:
+                return (name,)
+        raise ValueError(f"Can't tell the key of {item} for table {self.name}")
+
+    def _key(self, item: dict) -> tuple:
+        return tuple(item[name] for name in self._key_names(item))
+
+    # Function to load items without simulated latency (benchmark setup)
+    def seed(self, items):
+        with self._lock:
+            for item in items:
+                self._items[self._key(item)] = item
+            self._version += 1
+
+    def get_item(self, Key, ConsistentRead=False, **kwargs):
+        self._sleep()
+        with self._lock:
+            item = self._items.get(self._key(Key))
+        return {'Item': copy.deepcopy(item)} if item is not None else {}
+
+    def put_item(self, Item, ConditionExpression=None, **kwargs):
+        self._sleep()
+        key = self._key(Item)
+        with self._lock:
+            if ConditionExpression is not None and not _evaluate(ConditionExpression, self._items.get(key, {})):
+                raise ClientError({'Error': {'Code': 'ConditionalCheckFailedException', 'Message': 'The conditional request failed'}}, 'PutItem')
+            self._items[key] = copy.deepcopy(Item)
+            self._version += 1
+        return {}
+
+    def delete_item(self, Key, **kwargs):
+        self._sleep()
+        with self._lock:
+            self._items.pop(self._key(Key), None)
+            self._version += 1
+        return {}
+
+    def query(self, KeyConditionExpression, ScanIndexForward=True, Limit=None, FilterExpression=None, **kwargs):
+        self._sleep()
+        with self._lock:
+            items = [item for item in self._items.values()
+                     if _evaluate(KeyConditionExpression, item) and _evaluate(FilterExpression, item)]
+        key_names = KEY_SCHEMAS.get(self.name, ())
+        if len(key_names) > 1:
+            items.sort(key=lambda item: item[key_names[1]], reverse=not ScanIndexForward)
+        if Limit:
+            items = items[:Limit]
+        return {'Items': copy.deepcopy(items), 'Count': len(items)}
+
+    def scan(self, Segment=0, TotalSegments=1, ExclusiveStartKey=None, FilterExpression=None,
+             ProjectionExpression=None, ExpressionAttributeNames=None, Select=None, **kwargs):
+        self._sleep()
+        with self._lock:
+            keys = self._segment_keys(Segment, TotalSegments)
+            start = ExclusiveStartKey['offset'] if ExclusiveStartKey else 0
+            page = [self._items[key] for key in keys[start:start + SCAN_PAGE_ITEMS] if key in self._items]
+
+        matched = [item for item in page if _evaluate(FilterExpression, item)]
+        response = {'Count': len(matched), 'ScannedCount': len(page)}
+        if Select != 'COUNT':
+            response['Items'] = [copy.deepcopy(_project(item, ProjectionExpression, ExpressionAttributeNames or {}))
+                                 for item in matched]
+        if start + SCAN_PAGE_ITEMS < len(keys):
+            response['LastEvaluatedKey'] = {'offset': start + SCAN_PAGE_ITEMS}
+        return response
+
+    def batch_writer(self, overwrite_by_pkeys=None):
+        return FakeBatchWriter(self, overwrite_by_pkeys)
+
+
+class FakeDynamoResource:
+    """
+    Stand-in for boto3.resource('dynamodb'); every Table(name) call returns the same FakeTable.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.tables = {}
+        self._lock = threading.Lock()
+        # instrumentation.instrument_dynamodb registers botocore hooks on the client
+        self.meta = SimpleNamespace(client=SimpleNamespace(meta=SimpleNamespace(
+            events=SimpleNamespace(register=lambda *args, **kwargs: None)
+        )))
+
+    def Table(self, name: str) -> FakeTable:
+        with self._lock:
+            if name not in self.tables:
+                self.tables[name] = FakeTable(name, self.latency)
+            return self.tables[name]
+
+
+def _fake_value(schema: dict):
+    kind = schema.get("type")
+    if kind == "object":
+        return {name: _fake_value(value) for name, value in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [_fake_value(schema.get("items", {})) for _ in range(schema.get("minItems", 1))]
+    if kind == "integer":
+        return random.randint(1, 10)
+    if kind == "number":
+        return round(random.random(), 2)
+    if kind == "boolean":
+        return random.random() < 0.5
+    return "fake"
+
+
+# Function to answer a packed scoring request for exactly the candidate labels it lists
+def _fake_packed_value(schema: dict, messages: list):
+    try:
+        request = json.loads(messages[-1]["content"])
+        labels = [candidate["candidate"] for candidate in request["Candidates"]]
+        entry_schema = schema["properties"]["candidates"]["items"]
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+    return {"candidates": [dict(_fake_value(entry_schema), candidate=label) for label in labels]}
+
+
+class FakeOpenAI:
+    """
+    Stand-in for the openai module's chat.completions.create.
+
+    Answers with a random object matching the requested json_schema, after
+    `latency` seconds; packed scoring requests get an entry per requested
+    candidate label. Use it by assigning it over matchMakingAlgorithm.openai.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model=None, messages=None, response_format=None, n: int = 1, **kwargs):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        schema = ((response_format or {}).get("json_schema") or {}).get("schema", {"type": "string"})
+        choices = []
+        for index in range(n):
+            value = _fake_packed_value(schema, messages or []) if "candidates" in schema.get("properties", {}) else None
+            if value is None:
+                value = _fake_value(schema)
+            choices.append(SimpleNamespace(index=index, message=SimpleNamespace(role="assistant", content=json.dumps(value))))
+        return SimpleNamespace(id=f"chatcmpl-{uuid.uuid4().hex}", choices=choices)
+
+
+_CITIES = ["New York", "Boston", "Chicago", "Austin", "Seattle", "Denver", "Miami", "Portland"]
+_GOALS = ["long-term relationship", "marriage", "something casual", "friendship first", "life partner"]
+_INTERESTS = ["hiking", "cooking", "jazz", "board games", "travel", "yoga", "photography", "reading",
+              "running", "painting", "wine tasting", "football", "climbing", "film", "gardening"]
+_TRAITS = ["kind", "funny", "ambitious", "calm", "curious", "outgoing", "thoughtful", "adventurous", "loyal"]
+_KIDS = ["want kids someday", "don't want kids", "have two kids", "open to kids", "no kids"]
+_SMOKING = ["non-smoker", "social smoker", "never smoked", "no smokers please", "smoke occasionally"]
+_PETS = ["have a dog", "allergic to cats", "love cats", "no pets", "two cats"]
+_TRAVEL = ["yes, happy to relocate", "willing to travel", "prefer to stay local", "no"]
+
+
+# Function to generate a random but realistic-looking UserProfiles item
+def fake_profile(user_id: str, rng: random.Random = random) -> dict:
+    age = rng.randint(21, 55)
+    return {
+        'UserID': user_id,
+        'UpdatedAt': int(time.time() * 1000),
+        'UserProfile': {
+            "relationship_goals": rng.choice(_GOALS),
+            "appearance": rng.choice(["tall", "athletic", "petite", "average build", "doesn't matter"]),
+            "location": rng.choice(_CITIES),
+            "spirituality": rng.choice(["spiritual", "not religious", "christian", "buddhist", "agnostic"]),
+            "personality_attributes": ", ".join(rng.sample(_TRAITS, 3)),
+            "age": f"{age}, looking for {max(age - 5, 18)}-{age + 5}",
+            "interests": ", ".join(rng.sample(_INTERESTS, 4)),
+            "identity_and_preference": rng.choice(["straight woman", "straight man", "gay man", "lesbian", "bisexual"]),
+            "kids": rng.choice(_KIDS),
+            "smoking": rng.choice(_SMOKING),
+            "pets": rng.choice(_PETS),
+            "career_goals": rng.choice(["start a company", "become a doctor", "teach", "work remotely", "retire early"]),
+            "annual_income": str(rng.randrange(30000, 250000, 5000)),
+            "willingness_to_travel": rng.choice(_TRAVEL),
+            "special_requests": rng.choice(["", "must love dogs", "someone who reads", "no long distance", ""])
+        }
+    }
+
+
+def fake_profiles(count: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    return [fake_profile(f"user-{number}", rng) for number in range(count)]
+
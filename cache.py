@@ -0,0 +1,153 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache with an optional per-entry TTL (in seconds).
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return default
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl: float = None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            return default if entry is None else entry[0]
+
+    def items(self) -> list:
+        now = time.monotonic()
+        with self._lock:
+            return [(key, value) for key, (value, expires_at) in self._entries.items()
+                    if expires_at is None or expires_at > now]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class LoadingCache:
+    """
+    Thread-safe counterpart of AsyncLoadingCache for blocking loaders.
+
+    Concurrent gets for a key that isn't cached share one call to
+    loader(key); the other threads wait for its result. A None result is
+    treated as a failed load and not cached.
+    """
+
+    def __init__(self, loader, maxsize: int = 1024, ttl: float = None):
+        self.loader = loader
+        self._entries = LRUCache(maxsize, ttl)
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        value = self._entries.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        with self._lock:
+            future = self._inflight.get(key)
+            loading = future is None
+            if loading:
+                future = self._inflight[key] = Future()
+        if not loading:
+            return future.result()
+
+        try:
+            value = self.loader(key)
+            if value is not None:
+                self._entries.set(key, value)
+            future.set_result(value)
+            return value
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def invalidate(self, key):
+        self._entries.pop(key)
+
+
+class AsyncLoadingCache:
+    """
+    LRU/TTL cache in front of an async loader, with single-flight loads.
+
+    Concurrent gets for a key that isn't cached share one call to
+    loader(key). A None result is treated as a failed load and not cached.
+    """
+
+    def __init__(self, loader, maxsize: int = 1024, ttl: float = None):
+        self.loader = loader
+        self._entries = LRUCache(maxsize, ttl)
+        self._inflight = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    async def get(self, key):
+        value = self._entries.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._load(key))
+            self._inflight[key] = future
+        # shield() so one cancelled caller doesn't cancel the load for the others
+        return await asyncio.shield(future)
+
+    async def _load(self, key):
+        try:
+            value = await self.loader(key)
+            if value is not None:
+                self._entries.set(key, value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def invalidate(self, key):
+        self._entries.pop(key)
@@ -0,0 +1,403 @@
+import re
+import sys
+import threading
+from collections import defaultdict
+
+import indexSync
+
+UNKNOWN = "unknown"
+
+# Structured fields the index is keyed on
+INDEXED_FIELDS = ["age", "kids", "smoking", "pets", "location", "willingness_to_travel", "gender", "seeks"]
+
+# Genders read from identity_and_preference
+GENDERS = ("man", "woman", "nonbinary")
+
+
+class Vocabulary:
+    """
+    Interns the values of one categorical field as small integer codes.
+
+    Code 0 is always UNKNOWN and the seeded values take the next codes, so
+    those stay fixed. Codes are never reused, so they stay valid for as long
+    as the process runs.
+    """
+
+    def __init__(self, values=()):
+        self._codes = {UNKNOWN: 0}
+        self._values = [UNKNOWN]
+        self._lock = threading.Lock()
+        for value in values:
+            self.code(value)
+
+    def __len__(self):
+        return len(self._values)
+
+    def code(self, value: str) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            with self._lock:
+                code = self._codes.get(value)
+                if code is None:
+                    code = len(self._values)
+                    self._values.append(sys.intern(value))
+                    self._codes[self._values[code]] = code
+        return code
+
+    def value(self, code: int) -> str:
+        return self._values[code]
+
+
+# Vocabulary of every categorical field, seeded with the values the classifiers below return
+VOCABULARIES = {
+    "kids": Vocabulary(("wants", "doesnt_want", "has")),
+    "smoking": Vocabulary(("smoker", "non_smoker", "no_smokers")),
+    "pets": Vocabulary(("has_pets", "no_pets")),
+    "location": Vocabulary(),
+    "willingness_to_travel": Vocabulary(("willing", "unwilling")),
+    "gender": Vocabulary(GENDERS)
+}
+
+_AGE_RANGE_RE = re.compile(r"\b(\d{2})\s*(?:-|–|to)\s*(\d{2})\b")
+_AGE_RE = re.compile(r"\b(\d{2})\b")
+_NEGATION_RE = r"(?:no|not|don'?t|do not|doesn'?t|does not|never|won'?t|can'?t)"
+
+# Negated "want", e.g. "don't want", "never wanted", "do not really want"
+_NOT_WANT = r"\b(?:don't|dont|do not|doesn't|does not|never|won't|not)\s+(?:really\s+|ever\s+)?(?:want|wanted|interested in)\b"
+_UNNEGATED = r"(?<!n't )(?<!not )(?<!never )(?<!dont )"
+
+_KIDS_NO_RE = re.compile(rf"child-?free|{_NOT_WANT}\s+(?:any\s+|more\s+|to have\s+)?(?:kids|children|them|more|any)\b|\bno (?:more )?kids for me\b")
+_KIDS_WANTS_RE = re.compile(rf"{_UNNEGATED}\bwants?\s+(?:to have\s+)?(?:kids|children|them|a family|some|one)\b|\bwould love (?:kids|children|some|a family|to have)\b|\bsomeday\b|\bhop(?:e|ing) to have\b|\bplanning (?:on|to have)\b")
+_KIDS_HAS_RE = re.compile(rf"{_UNNEGATED}\b(?:have|has)\s+(?:a|an|one|two|three|four|\d+|my|grown)\s+(?:\w+\s+)?(?:kids?|child(?:ren)?|sons?|daughters?)\b|\b(?:mom|mother|dad|father|parent) of\b|\bmy (?:kids|children|son|daughter)\b")
+
+_SMOKING_DEALBREAKER_RE = re.compile(rf"\bno smokers\b|\b{_NEGATION_RE}\b[\w\s']*\bdate\b[\w\s']*\bsmoker|deal ?breaker|non-?smoking partner")
+_SMOKING_NO_RE = re.compile(rf"non-?smok|\bsmoke[- ]?free\b|\bex-?\s?smoker|\bformer smoker|\bquit\b|\b{_NEGATION_RE}\b[\w\s']*\bsmok|^\s*no\b|\bnever\b")
+_SMOKING_YES_RE = re.compile(rf"{_UNNEGATED}(?<!non-)(?<!ex-)(?<!ex )(?<!former )(?<!quit )(?<!no )\bsmok(?!e[- ]?free)|\bvap|\boccasional|\bsocial")
+
+_PETS_NO_RE = re.compile(rf"\ballergic\b|\bno pets\b|{_NOT_WANT}\s+(?:any\s+)?(?:pets?|animals)\b|\bcan't have (?:pets|animals)\b|\bnot an? (?:pet|animal|dog|cat) person\b|^\s*(?:no|none)\s*[.!]?\s*$")
+_PETS_YES_RE = re.compile(rf"{_UNNEGATED}\b(?:have|has|own)\s+(?:a|an|one|two|three|\d+|my|some)\s+(?:\w+\s+)?(?:dogs?|cats?|pets?|puppy|puppies|kittens?|rabbits?|birds?)\b|\b(?:dog|cat|pet) (?:mom|dad|parent|owner)\b|\bmy (?:dog|cat|pets?|puppy)\b|^\s*(?:one|two|three|\d+|a) (?:dogs?|cats?)\s*$")
+
+_TRAVEL_NO_RE = re.compile(r"^\s*(?:no|nope)\s*[.!]?\s*$|\bunwilling\b|\bnot (?:willing|open)\b|\b(?:won't|can't|cannot|don't want to|do not want to)\s+(?:travel|relocate|move)\b|\bprefer to stay\b|\bno long[- ]distance\b")
+_TRAVEL_YES_RE = re.compile(rf"^\s*yes\b|(?<!not )\bwilling\b|(?<!not )\bopen to\b|\bhappy to\b|\blove to\b|{_UNNEGATED}\brelocat|\bdon't mind (?:travel|relocat|moving)|\bcan't wait to (?:travel|move)\b")
+
+_WOMAN_RE = re.compile(r"\b(?:woman|women|female|females|girls?|lady|ladies|lesbians?)\b")
+_MAN_RE = re.compile(r"\b(?:man|men|male|males|guys?|gentlem[ae]n)\b")
+_NONBINARY_RE = re.compile(r"non-?binary|\benby\b|genderqueer|genderfluid")
+_SEEKS_RE = re.compile(r"\b(?:seeking|looking for|interested in|attracted to|into|dating)\b")
+_NOT_SEEKING_RE = re.compile(r"\b(?:not|never|no longer|don't|dont|do not|isn't|am not|i'm not)\s+(?:really\s+|currently\s+|ever\s+)?(?:seeking|looking for|interested in|attracted to|into|dating|date)\b")
+_ANY_GENDER_RE = re.compile(r"\b(?:anyone|everyone|any gender|all genders)\b")
+_BI_RE = re.compile(r"\b(?:bi|bisexual|pan|pansexual|queer|omnisexual)\b")
+_STRAIGHT_RE = re.compile(r"\b(?:straight|hetero|heterosexual)\b")
+_GAY_RE = re.compile(r"\b(?:gay|lesbian|homosexual)\b")
+
+_ANYWHERE_RE = re.compile(r"\b(?:anywhere|any|remote|flexible|not specified)\b")
+
+
+def _text(value) -> str:
+    return str(value).strip().lower().replace("’", "'") if value is not None else ""
+
+
+def parse_age(value):
+    """
+    Parse the age field into the user's own age and their preferred partner age range.
+
+    Returns:
+    - An (age, (min_age, max_age)) tuple; either part is None when it can't be read.
+    """
+    text = _text(value)
+    preferred = None
+    range_match = _AGE_RANGE_RE.search(text)
+    if range_match:
+        low, high = sorted(int(group) for group in range_match.groups())
+        preferred = (low, high)
+        text = text[:range_match.start()] + " " + text[range_match.end():]
+
+    age_match = _AGE_RE.search(text)
+    age = int(age_match.group(1)) if age_match else None
+    return age, preferred
+
+
+def _classify(text: str, negative_re, positive_re, negative: str, positive: str) -> str:
+    # Only an unambiguous answer can exclude anyone: mixed cues stay unknown
+    is_negative = bool(negative_re.search(text))
+    is_positive = bool(positive_re.search(text))
+    if is_negative and not is_positive:
+        return negative
+    if is_positive and not is_negative:
+        return positive
+    return UNKNOWN
+
+
+def classify_kids(value) -> str:
+    text = _text(value)
+    if not text:
+        return UNKNOWN
+    wants = _classify(text, _KIDS_NO_RE, _KIDS_WANTS_RE, "doesnt_want", "wants")
+    if wants == UNKNOWN and _KIDS_HAS_RE.search(text) and not _KIDS_WANTS_RE.search(text):
+        return "has"
+    return wants
+
+
+def classify_smoking(value) -> str:
+    text = _text(value)
+    if not text:
+        return UNKNOWN
+    if _SMOKING_DEALBREAKER_RE.search(text):
+        return "no_smokers"
+    return _classify(text, _SMOKING_NO_RE, _SMOKING_YES_RE, "non_smoker", "smoker")
+
+
+def classify_pets(value) -> str:
+    text = _text(value)
+    if not text:
+        return UNKNOWN
+    return _classify(text, _PETS_NO_RE, _PETS_YES_RE, "no_pets", "has_pets")
+
+
+def classify_travel(value) -> str:
+    text = _text(value)
+    if not text:
+        return UNKNOWN
+    return _classify(text, _TRAVEL_NO_RE, _TRAVEL_YES_RE, "unwilling", "willing")
+
+
+def normalize_location(value) -> str:
+    text = _text(value)
+    if not text or _ANYWHERE_RE.search(text):
+        return UNKNOWN
+    city = re.sub(r"^(?:in|near|around)\s+", "", text.split(",")[0].strip())
+    city = re.sub(r"[^a-z0-9 ]", "", city).strip()
+    return city or UNKNOWN
+
+
+def _genders(text: str) -> set:
+    genders = set()
+    if _WOMAN_RE.search(text):
+        genders.add("woman")
+    if _MAN_RE.search(text):
+        genders.add("man")
+    if _NONBINARY_RE.search(text):
+        genders.add("nonbinary")
+    return genders
+
+
+def parse_identity(value):
+    """
+    Parse identity_and_preference into the user's gender and the genders they're looking for.
+
+    Returns:
+    - A (gender, seeks) tuple: gender is one of GENDERS or UNKNOWN, seeks a
+      sorted tuple of GENDERS or UNKNOWN (anyone, or can't tell).
+    """
+    text = _text(value)
+    # A negated preference ("not interested in women") says who isn't wanted, never who is
+    not_seeking_match = _NOT_SEEKING_RE.search(text)
+    if not_seeking_match:
+        own = _genders(text[:not_seeking_match.start()])
+        return own.pop() if len(own) == 1 else UNKNOWN, UNKNOWN
+
+    seeks_match = _SEEKS_RE.search(text)
+    own_text, wanted_text = (text[:seeks_match.start()], text[seeks_match.end():]) if seeks_match else (text, "")
+
+    own = _genders(own_text)
+    gender = own.pop() if len(own) == 1 else UNKNOWN
+
+    # An explicit "looking for ..." wins over the orientation word
+    if wanted_text:
+        wanted = _genders(wanted_text)
+        if wanted and not _ANY_GENDER_RE.search(wanted_text):
+            return gender, tuple(sorted(wanted))
+        return gender, UNKNOWN
+
+    if _BI_RE.search(own_text) or gender not in ("man", "woman"):
+        return gender, UNKNOWN
+    if _GAY_RE.search(own_text) and not _STRAIGHT_RE.search(own_text):
+        return gender, (gender,)
+    if _STRAIGHT_RE.search(own_text) and not _GAY_RE.search(own_text):
+        return gender, ("woman",) if gender == "man" else ("man",)
+    return gender, UNKNOWN
+
+
+def seeks_mask(seeks) -> int:
+    """
+    Pack the genders sought (a parse_identity seeks value) into a bit per gender code; 0 is UNKNOWN.
+    """
+    if seeks == UNKNOWN:
+        return 0
+    return sum(1 << VOCABULARIES["gender"].code(gender) for gender in seeks)
+
+
+def _posting_values(field: str, profile) -> list:
+    # "seeks" is posted once per gender code sought, so the index can answer "who is looking for X"
+    value = getattr(profile, field)
+    if field == "seeks" and value:
+        return [code for code in range(len(VOCABULARIES["gender"])) if value >> code & 1]
+    return [value]
+
+
+def _code(field: str, value: str) -> int:
+    return VOCABULARIES[field].code(value)
+
+
+class CandidateIndex:
+    """
+    In-memory bitmap index over the structured fields of parsed profiles.
+
+    Every profile owns one bit position; each (field, value) pair maps to an
+    integer bitmap of the profiles holding that value. Dealbreakers are then
+    resolved with a handful of AND/OR operations instead of a pass over every
+    profile. Unknown values never exclude a candidate.
+
+    Profiles are profiles.Profile objects: ages are ints (None when unknown),
+    the other fields Vocabulary codes and seeks a seeks_mask.
+    """
+
+    def __init__(self, profiles=()):
+        self._positions = {}
+        self._profiles = []
+        self._free = []
+        self._all = 0
+        self._postings = {field: defaultdict(int) for field in INDEXED_FIELDS}
+        self._lock = threading.RLock()
+        for profile in profiles:
+            self.add(profile)
+
+    def __len__(self):
+        return len(self._positions)
+
+    # Function to index (or re-index) a parsed profile
+    def add(self, profile):
+        with self._lock:
+            position = self._positions.get(profile.user_id)
+            if position is not None:
+                # Every indexed field is parsed from the texts, so equal texts index the same
+                if self._profiles[position].texts == profile.texts:
+                    self._profiles[position] = profile
+                    return
+                self.remove(profile.user_id)
+
+            if self._free:
+                position = self._free.pop()
+                self._profiles[position] = profile
+            else:
+                position = len(self._profiles)
+                self._profiles.append(profile)
+
+            bit = 1 << position
+            self._positions[profile.user_id] = position
+            self._all |= bit
+            for field in INDEXED_FIELDS:
+                for value in _posting_values(field, profile):
+                    self._postings[field][value] |= bit
+
+    # Function to remove a profile from the index
+    def remove(self, user_id: str):
+        with self._lock:
+            position = self._positions.pop(user_id, None)
+            if position is None:
+                return
+
+            bit = 1 << position
+            profile = self._profiles[position]
+            self._all &= ~bit
+            for field in INDEXED_FIELDS:
+                for value in _posting_values(field, profile):
+                    self._postings[field][value] &= ~bit
+
+            self._profiles[position] = None
+            self._free.append(position)
+
+    # Function to bring the index in line with a full list of parsed profiles
+    def sync(self, all_profiles: list):
+        indexSync.sync_index(self._lock, all_profiles, self.add, self.remove, lambda: self._positions)
+
+    def _mask(self, field: str, values) -> int:
+        mask = 0
+        postings = self._postings[field]
+        for value in values:
+            mask |= postings.get(value, 0)
+        return mask
+
+    def _posting(self, field: str, value: str) -> int:
+        return self._postings[field].get(_code(field, value), 0)
+
+    def _age_mask(self, low: int, high: int) -> int:
+        return self._mask("age", [age for age in self._postings["age"] if age is None or low <= age <= high])
+
+    def candidate_mask(self, profile) -> int:
+        """
+        Bitmap of the indexed profiles compatible with the given requester profile.
+        """
+        mask = self._all
+
+        if profile.min_age is not None:
+            mask &= self._age_mask(profile.min_age, profile.max_age)
+
+        # Kids: exclude people who want the opposite of the requester
+        if profile.kids == _code("kids", "wants"):
+            mask &= ~self._posting("kids", "doesnt_want")
+        elif profile.kids == _code("kids", "doesnt_want"):
+            mask &= ~self._posting("kids", "wants")
+
+        # Smoking: a "no smokers" dealbreaker works in both directions
+        if profile.smoking == _code("smoking", "no_smokers"):
+            mask &= ~self._posting("smoking", "smoker")
+        elif profile.smoking == _code("smoking", "smoker"):
+            mask &= ~self._posting("smoking", "no_smokers")
+
+        # Pets: someone who can't live with pets excludes pet owners and vice versa
+        if profile.pets == _code("pets", "no_pets"):
+            mask &= ~self._posting("pets", "has_pets")
+        elif profile.pets == _code("pets", "has_pets"):
+            mask &= ~self._posting("pets", "no_pets")
+
+        # Location: different places only work out if at least one side will travel
+        if profile.location and profile.willingness_to_travel == _code("willingness_to_travel", "unwilling"):
+            mask &= (
+                self._mask("location", [profile.location, 0])
+                | ~self._posting("willingness_to_travel", "unwilling")
+            )
+
+        # Gender and orientation work both ways: each side has to be looking for the other
+        if profile.seeks:
+            mask &= self._mask("gender", _posting_values("seeks", profile) + [0])
+        if profile.gender:
+            mask &= self._mask("seeks", [profile.gender, 0])
+
+        return mask
+
+    def allows(self, profile, candidate_id: str) -> bool:
+        """
+        Check a single indexed candidate against a profile's dealbreakers.
+        """
+        with self._lock:
+            position = self._positions.get(candidate_id)
+            if position is None or candidate_id == profile.user_id:
+                return False
+            return bool(self.candidate_mask(profile) >> position & 1)
+
+    def filter_ids(self, profile, candidate_ids) -> list:
+        """
+        Keep only the given candidate IDs that pass the profile's dealbreakers.
+        """
+        with self._lock:
+            mask = self.candidate_mask(profile)
+            return [candidate_id for candidate_id in candidate_ids
+                    if candidate_id != profile.user_id and candidate_id in self._positions
+                    and mask >> self._positions[candidate_id] & 1]
+
+    def filter_candidates(self, profile) -> list:
+        """
+        Prune the candidate pool for a profile using the hard-constraint bitmaps.
+
+        Returns:
+        - A list of the indexed profiles that pass every dealbreaker, excluding the requester.
+        """
+        with self._lock:
+            mask = self.candidate_mask(profile)
+            position = self._positions.get(profile.user_id)
+            if position is not None:
+                mask &= ~(1 << position)
+
+            # Walk the set bits via the binary string, lowest position first
+            return [self._profiles[position] for position, bit in enumerate(reversed(bin(mask)[2:])) if bit == "1"]
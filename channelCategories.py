@@ -0,0 +1,76 @@
+import asyncio
+import time
+from typing import Optional
+
+
+class ChannelCategoryResolver:
+    """
+    Cached name -> ID map of Heart channel categories.
+
+    The full list is fetched lazily: on first use, once it is older than
+    ttl seconds, or when a name isn't in it. Create-if-missing runs under a
+    lock and re-checks the list first, so concurrent matches can't create
+    duplicate categories. Call invalidate() when a cached ID stops working.
+
+    list_categories() returns a list of {'id', 'name'} dicts (None on error)
+    and create_category(name) returns the new ID (None on error).
+    """
+
+    def __init__(self, list_categories, create_category, ttl: float = 3600):
+        self.list_categories = list_categories
+        self.create_category = create_category
+        self.ttl = ttl
+        self._ids = {}
+        self._loaded_at = None
+        self._lock = None
+
+    def _get_lock(self) -> asyncio.Lock:
+        # Created lazily so the lock belongs to the running event loop
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    def _is_stale(self) -> bool:
+        return self._loaded_at is None or (self.ttl and time.monotonic() - self._loaded_at >= self.ttl)
+
+    async def refresh(self) -> bool:
+        categories = await self.list_categories()
+        if categories is None:
+            return False
+
+        self._ids = {category['name']: category['id'] for category in categories}
+        self._loaded_at = time.monotonic()
+        return True
+
+    async def lookup(self, name: str) -> Optional[str]:
+        """
+        Return the category's ID, or None if it doesn't exist.
+        """
+        if self._is_stale() or name not in self._ids:
+            await self.refresh()
+        return self._ids.get(name)
+
+    async def resolve(self, name: str) -> Optional[str]:
+        """
+        Return the category's ID, creating the category if it doesn't exist.
+        """
+        category_id = self._ids.get(name)
+        if category_id and not self._is_stale():
+            return category_id
+
+        async with self._get_lock():
+            category_id = await self.lookup(name)
+            if category_id:
+                return category_id
+
+            category_id = await self.create_category(name)
+            if category_id:
+                self._ids[name] = category_id
+            return category_id
+
+    def invalidate(self, name: str = None):
+        if name is None:
+            self._ids = {}
+        else:
+            self._ids.pop(name, None)
+        self._loaded_at = None
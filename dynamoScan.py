@@ -0,0 +1,152 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from boto3.dynamodb.conditions import Key
+
+# Number of DynamoDB scan segments read concurrently
+SCAN_SEGMENTS = int(os.getenv("SCAN_SEGMENTS", "4"))
+
+# Pages buffered between the segment workers and the consumer
+SCAN_QUEUE_PAGES = 8
+
+_DONE = object()
+
+# Items written with an HourBucket attribute can be read back by time through a GSI
+# keyed on (HourBucket, <timestamp attribute>), one Query per hour instead of a Scan
+HOUR_MS = 3600 * 1000
+
+
+def projection_kwargs(attributes) -> dict:
+    """
+    Build ProjectionExpression/ExpressionAttributeNames for a list of attribute names.
+
+    Placeholders are always used so reserved words such as Timestamp are safe.
+    """
+    if not attributes:
+        return {}
+    names = {f"#p{i}": attribute for i, attribute in enumerate(attributes)}
+    return {
+        "ProjectionExpression": ", ".join(names),
+        "ExpressionAttributeNames": names
+    }
+
+
+def _merge_projection(projection, scan_kwargs: dict) -> dict:
+    scan_kwargs = dict(scan_kwargs)
+    if projection:
+        extra = projection_kwargs(projection)
+        scan_kwargs["ProjectionExpression"] = extra["ProjectionExpression"]
+        scan_kwargs["ExpressionAttributeNames"] = {
+            **scan_kwargs.get("ExpressionAttributeNames", {}),
+            **extra["ExpressionAttributeNames"]
+        }
+    return scan_kwargs
+
+
+def _put(pages: queue.Queue, stop: threading.Event, value) -> bool:
+    # Block while the consumer is behind, but give up once it has gone away
+    while not stop.is_set():
+        try:
+            pages.put(value, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _scan_segment(table, segment: int, total_segments: int, scan_kwargs: dict, pages: queue.Queue, stop: threading.Event):
+    try:
+        kwargs = dict(scan_kwargs, Segment=segment, TotalSegments=total_segments)
+        while not stop.is_set():
+            response = table.scan(**kwargs)
+            if not _put(pages, stop, response):
+                return
+            if 'LastEvaluatedKey' not in response:
+                break
+            kwargs["ExclusiveStartKey"] = response['LastEvaluatedKey']
+    except Exception as e:
+        _put(pages, stop, e)
+    finally:
+        _put(pages, stop, _DONE)
+
+
+def scan_pages(table, total_segments: int = SCAN_SEGMENTS, projection=None, max_workers: int = None, **scan_kwargs):
+    """
+    Parallel scan of a DynamoDB table, yielding raw scan responses as they arrive.
+
+    Parameters:
+    - table: The boto3 Table to scan.
+    - total_segments: Number of Segment/TotalSegments slices scanned concurrently.
+    - projection: Optional list of attribute names to fetch instead of whole items.
+    - max_workers: Thread pool size (defaults to one thread per segment).
+    - scan_kwargs: Extra arguments passed to every scan call (FilterExpression, Select, ...).
+    """
+    scan_kwargs = _merge_projection(projection, scan_kwargs)
+    pages = queue.Queue(maxsize=SCAN_QUEUE_PAGES)
+    stop = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=max_workers or total_segments)
+
+    try:
+        for segment in range(total_segments):
+            executor.submit(_scan_segment, table, segment, total_segments, scan_kwargs, pages, stop)
+
+        remaining = total_segments
+        while remaining:
+            page = pages.get()
+            if page is _DONE:
+                remaining -= 1
+            elif isinstance(page, Exception):
+                raise page
+            else:
+                yield page
+    finally:
+        # Also reached when the consumer stops early: release the workers
+        stop.set()
+        executor.shutdown(wait=False)
+
+
+def parallel_scan(table, total_segments: int = SCAN_SEGMENTS, projection=None, max_workers: int = None, **scan_kwargs):
+    """
+    Parallel scan of a DynamoDB table, yielding items one at a time.
+
+    Items are streamed, so callers can count or aggregate without holding the
+    whole table in memory. Takes the same arguments as scan_pages.
+    """
+    for page in scan_pages(table, total_segments, projection, max_workers, **scan_kwargs):
+        yield from page.get('Items', [])
+
+
+def parallel_count(table, total_segments: int = SCAN_SEGMENTS, max_workers: int = None, **scan_kwargs) -> int:
+    """
+    Count the items in a DynamoDB table (after any FilterExpression) with Select=COUNT.
+
+    Only counts come back over the wire, never item data.
+    """
+    return sum(page.get('Count', 0) for page in scan_pages(table, total_segments, None, max_workers, Select='COUNT', **scan_kwargs))
+
+
+# Function to name the hour bucket a millisecond timestamp falls in (the partition key of a time index)
+def hour_bucket(timestamp) -> str:
+    return str(int(timestamp) // HOUR_MS)
+
+
+def query_since(table, index_name: str, sort_key: str, since: int, projection=None):
+    """
+    Yield the items whose sort_key timestamp is after `since`, through an HourBucket index.
+
+    Each hour bucket from `since` up to now is one paginated Query, so only
+    the items written in that window are read.
+    """
+    now = int(time.time() * 1000)
+    query_kwargs = _merge_projection(projection, {"IndexName": index_name})
+    for hour in range(int(since) // HOUR_MS, now // HOUR_MS + 1):
+        kwargs = dict(query_kwargs, KeyConditionExpression=Key('HourBucket').eq(str(hour)) & Key(sort_key).gt(since))
+        while True:
+            response = table.query(**kwargs)
+            yield from response.get('Items', [])
+            if 'LastEvaluatedKey' not in response:
+                break
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
@@ -0,0 +1,148 @@
+import threading
+from collections import defaultdict
+
+import numpy as np
+
+import indexSync
+import scoring
+
+# Free-text profile fields compared semantically
+EMBEDDED_FIELDS = ["interests", "personality_attributes", "relationship_goals", "special_requests"]
+
+# Hashed dimensions per field; the profile vector concatenates all fields
+FIELD_DIM = 64
+
+# A handful of common words carry no signal about compatibility
+_STOP_WORDS = {
+    "a", "an", "and", "the", "to", "of", "in", "on", "for", "with", "i", "i'm", "im", "my", "me",
+    "is", "am", "are", "be", "or", "that", "who", "someone", "like", "love", "really", "very"
+}
+
+
+# Function to turn a free-text value into unigram and bigram features
+def text_features(text) -> list:
+    tokens = [token for token in scoring.tokenize(text) if token not in _STOP_WORDS]
+    return tokens + [f"{first} {second}" for first, second in zip(tokens, tokens[1:])]
+
+
+def embed_profile(profile, field_dim: int = FIELD_DIM) -> np.ndarray:
+    """
+    Embed a parsed profile's (profiles.Profile) free-text fields into one unit vector, offline.
+
+    Each field is a signed hashed bag of unigrams and bigrams; fields are
+    normalised separately so a long answer can't drown out the others.
+    """
+    vector = np.concatenate([
+        scoring.hash_tokens(text_features(profile.get(field)), field_dim) for field in EMBEDDED_FIELDS
+    ])
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return vector
+
+
+class EmbeddingIndex:
+    """
+    Random-projection LSH index over profile embeddings.
+
+    Each of the `tables` hash tables buckets a vector by the signs of its
+    projections on `bits` random hyperplanes, so similar profiles collide
+    with high probability. A query only re-ranks the profiles sharing a
+    bucket (probing neighbouring buckets when too few collide), which keeps
+    lookups sub-linear in the number of profiles.
+    """
+
+    def __init__(self, tables: int = 16, bits: int = 12, field_dim: int = FIELD_DIM, seed: int = 0):
+        self.field_dim = field_dim
+        dim = field_dim * len(EMBEDDED_FIELDS)
+        rng = np.random.default_rng(seed)
+        self._planes = rng.standard_normal((tables * bits, dim)).astype(np.float32)
+        self._tables = tables
+        self._bits = bits
+        self._powers = 1 << np.arange(bits, dtype=np.int64)
+        self._buckets = [defaultdict(set) for _ in range(tables)]
+        self._vectors = {}
+        self._keys = {}
+        self._profiles = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._vectors)
+
+    def _bucket_keys(self, vector: np.ndarray) -> list:
+        signs = (self._planes @ vector > 0).reshape(self._tables, self._bits)
+        return [int(key) for key in signs.astype(np.int64) @ self._powers]
+
+    # Function to index (or re-index) a parsed profile
+    def upsert(self, profile):
+        user_id = profile.user_id
+        with self._lock:
+            current = self._profiles.get(user_id)
+            if current is not None and current.texts == profile.texts:
+                self._profiles[user_id] = profile
+                return
+            self.remove(user_id)
+
+            vector = embed_profile(profile, self.field_dim)
+            self._profiles[user_id] = profile
+            if not vector.any():
+                # Nothing to compare on; rank_candidates reaches it through the bitmap fallback
+                return
+
+            keys = self._bucket_keys(vector)
+            for table, key in enumerate(keys):
+                self._buckets[table][key].add(user_id)
+            self._vectors[user_id] = vector
+            self._keys[user_id] = keys
+
+    def remove(self, user_id: str):
+        with self._lock:
+            self._profiles.pop(user_id, None)
+            self._vectors.pop(user_id, None)
+            keys = self._keys.pop(user_id, None)
+            if keys is None:
+                return
+            for table, key in enumerate(keys):
+                bucket = self._buckets[table][key]
+                bucket.discard(user_id)
+                if not bucket:
+                    del self._buckets[table][key]
+
+    # Function to bring the index in line with a full list of parsed profiles
+    def sync(self, all_profiles: list):
+        indexSync.sync_index(self._lock, all_profiles, self.upsert, self.remove, lambda: self._profiles)
+
+    def query(self, profile, k: int):
+        """
+        Find the profiles whose free-text fields are most similar to the given profile's.
+
+        Returns:
+        - A list of (UserID, cosine similarity) tuples, best first, or None when
+          the user has no free text to compare on.
+        """
+        vector = embed_profile(profile, self.field_dim)
+        if not vector.any():
+            return None
+
+        keys = self._bucket_keys(vector)
+        with self._lock:
+            candidates = set()
+            for table, key in enumerate(keys):
+                candidates |= self._buckets[table].get(key, set())
+
+            # Multi-probe: also look in buckets one hyperplane away
+            if len(candidates) < 10 * k:
+                for table, key in enumerate(keys):
+                    for bit in range(self._bits):
+                        candidates |= self._buckets[table].get(key ^ (1 << bit), set())
+
+            candidates.discard(profile.user_id)
+            if not candidates:
+                return []
+
+            user_ids = list(candidates)
+            vectors = np.stack([self._vectors[user_id] for user_id in user_ids])
+
+        similarities = vectors @ vector
+        best = np.argsort(-similarities)[:k]
+        return [(user_ids[i], float(similarities[i])) for i in best]
@@ -0,0 +1,69 @@
+import asyncio
+import json
+from typing import Optional
+
+import httpx
+
+import instrumentation
+
+
+class HeartClient:
+    """
+    Async Heart API client sharing one pooled, keep-alive connection set.
+
+    Requests are bounded by a semaphore so a burst of messages can't open
+    more concurrent calls than the pool is sized for.
+    """
+
+    def __init__(self, api_url: str, bearer_token: str, timeout: float = 10.0,
+                 max_connections: int = 20, max_keepalive_connections: int = 10, max_concurrency: int = 20):
+        # HEART_API_URL has historically been a bare host name
+        self.base_url = api_url if api_url and "://" in api_url else f"https://{api_url}"
+        self.bearer_token = bearer_token
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.max_concurrency = max_concurrency
+        self._client = None
+        self._semaphore = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # Created lazily so the pool and semaphore belong to the running event loop
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={
+                    'authorization': f'Bearer {self.bearer_token}',
+                    'accept': 'application/json',
+                    'content-type': 'application/json'
+                },
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections
+                )
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    async def request(self, method: str, path: str, payload: Optional[dict] = None) -> str:
+        """
+        Make a Heart API call and return the response body as text.
+        """
+        client = self._get_client()
+        async with self._semaphore:
+            with instrumentation.track("heart", f"{method} {instrumentation.route(path)}") as call:
+                response = await client.request(
+                    method,
+                    path,
+                    content=json.dumps(payload) if payload is not None else None
+                )
+                if response.status_code >= 400:
+                    call.failed()
+            return response.text
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._semaphore = None
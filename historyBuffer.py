@@ -0,0 +1,93 @@
+import threading
+import time
+from collections import OrderedDict, deque
+
+# Rough per-message bookkeeping overhead on top of the text itself
+MESSAGE_OVERHEAD_BYTES = 200
+
+
+def _message_size(item: dict) -> int:
+    return len(item.get('MessageContent', '')) + MESSAGE_OVERHEAD_BYTES
+
+
+class ConversationHistory:
+    """
+    Per-chat ring buffer of the most recent messages.
+
+    Messages are written through from store_message_in_dynamodb. A chat that
+    isn't buffered yet is loaded once from DynamoDB and then kept current by
+    those writes. The total size is bounded by max_bytes, evicting the least
+    recently used chats. Other worker processes write to the same table, so
+    each chat is reloaded once it is older than reload_after seconds (0
+    reloads on every read, for several workers sharing the chats). A reload
+    keeps buffered messages newer than anything loaded, since this
+    process's own writes may still be queued for DynamoDB.
+    """
+
+    def __init__(self, turns: int = 20, max_bytes: int = 64 * 1024 * 1024, reload_after: float = 600):
+        self.turns = turns
+        self.max_bytes = max_bytes
+        self.reload_after = reload_after
+        self._chats = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._chats)
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and self._chats:
+            _, chat = self._chats.popitem(last=False)
+            self._bytes -= chat["bytes"]
+
+    def _append(self, chat: dict, item: dict):
+        if len(chat["messages"]) == self.turns:
+            removed = chat["messages"].popleft()
+            chat["bytes"] -= _message_size(removed)
+            self._bytes -= _message_size(removed)
+        chat["messages"].append(item)
+        chat["bytes"] += _message_size(item)
+        self._bytes += _message_size(item)
+
+    def _replace(self, chat_id: str, items: list) -> list:
+        old = self._chats.pop(chat_id, None)
+        if old is not None:
+            self._bytes -= old["bytes"]
+            # Written here but maybe not flushed yet: keep what is newer than the loaded messages
+            latest = items[-1]['Timestamp'] if items else None
+            items = list(items) + [item for item in old["messages"] if latest is None or item['Timestamp'] > latest]
+
+        chat = {"messages": deque(), "bytes": 0, "loaded_at": time.monotonic()}
+        self._chats[chat_id] = chat
+        for item in items[-self.turns:]:
+            self._append(chat, item)
+        self._evict()
+        return list(chat["messages"])
+
+    def get(self, chat_id: str, loader) -> list:
+        """
+        Return the chat's recent messages, oldest first.
+
+        loader(chat_id) is called to fetch them from DynamoDB on a miss.
+        """
+        with self._lock:
+            chat = self._chats.get(chat_id)
+            if chat is not None and time.monotonic() - chat["loaded_at"] < self.reload_after:
+                self._chats.move_to_end(chat_id)
+                return list(chat["messages"])
+
+        items = loader(chat_id)
+        with self._lock:
+            return self._replace(chat_id, items)
+
+    # Function to write a stored message through to the chat's buffer
+    def append(self, chat_id: str, item: dict):
+        with self._lock:
+            chat = self._chats.get(chat_id)
+            # Unbuffered chats are loaded in full on their next read instead
+            if chat is None:
+                return
+            self._chats.move_to_end(chat_id)
+            self._append(chat, item)
+            self._evict()
@@ -0,0 +1,11 @@
+# Function to bring an in-memory profile index in line with a full list of parsed profiles:
+# upsert every profile, then remove whatever the index holds that the list no longer has
+def sync_index(lock, all_profiles, upsert, remove, indexed_ids):
+    with lock:
+        seen = set()
+        for profile in all_profiles:
+            seen.add(profile.user_id)
+            upsert(profile)
+
+        for user_id in [user_id for user_id in indexed_ids() if user_id not in seen]:
+            remove(user_id)
@@ -0,0 +1,246 @@
+import bisect
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets in seconds, from fast cache-backed DynamoDB reads to slow LLM calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(labelnames, values, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _header(self) -> list:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> list:
+        with self._lock:
+            values = list(self._values.items())
+        return self._header() + [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in values
+        ]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    """
+    Gauge set directly, or read from a callback each time metrics are rendered.
+    """
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames=(), function=None):
+        super().__init__(name, help, labelnames)
+        self.function = function
+
+    def set(self, value: float, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def render(self) -> list:
+        if self.function is None:
+            return super().render()
+        try:
+            value = self.function()
+        except Exception as e:
+            print(f"Error reading gauge {self.name}: {e}")
+            return self._header()
+        return self._header() + [f"{self.name} {_format_value(value)}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                # Per-bucket counts (plus +Inf), sum
+                series = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> list:
+        with self._lock:
+            values = [(labels, list(counts), total) for labels, (counts, total) in self._values.items()]
+
+        lines = self._header()
+        for labels, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                bucket_labels = _format_labels(self.labelnames, labels, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total!r}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+external_seconds = REGISTRY.register(Histogram(
+    "external_request_seconds", "Latency of calls to external dependencies.", ["dependency", "operation"]))
+external_errors = REGISTRY.register(Counter(
+    "external_request_errors_total", "Failed calls to external dependencies.", ["dependency", "operation"]))
+external_in_flight = REGISTRY.register(Gauge(
+    "external_requests_in_flight", "Calls to external dependencies currently in progress.", ["dependency"]))
+operation_seconds = REGISTRY.register(Histogram(
+    "operation_seconds", "End-to-end latency of request handling and matchmaking.", ["operation"]))
+operation_errors = REGISTRY.register(Counter(
+    "operation_errors_total", "Request handling and matchmaking runs that failed.", ["operation"]))
+
+
+class _Call:
+    def __init__(self):
+        self.ok = True
+
+    # Function to count a call that returned normally as an error (e.g. an HTTP 5xx)
+    def failed(self):
+        self.ok = False
+
+
+@contextmanager
+def track(dependency: str, operation: str):
+    """
+    Time a call to an external dependency, counting errors and in-flight calls.
+
+    Works around awaits as well: `with track("heart", "GET /v0/users/{id}") as call:`.
+    An exception, or call.failed(), counts the call as an error.
+    """
+    call = _Call()
+    external_in_flight.inc(dependency)
+    start = time.perf_counter()
+    try:
+        yield call
+    except BaseException:
+        call.ok = False
+        raise
+    finally:
+        external_seconds.observe(time.perf_counter() - start, dependency, operation)
+        external_in_flight.dec(dependency)
+        if not call.ok:
+            external_errors.inc(dependency, operation)
+
+
+@contextmanager
+def timed(operation: str):
+    """
+    Time an end-to-end operation such as handling one message.
+    """
+    call = _Call()
+    start = time.perf_counter()
+    try:
+        yield call
+    except BaseException:
+        call.ok = False
+        raise
+    finally:
+        operation_seconds.observe(time.perf_counter() - start, operation)
+        if not call.ok:
+            operation_errors.inc(operation)
+
+
+# Function to export a value such as a queue depth, read when /metrics is scraped
+def register_gauge(name: str, help: str, function):
+    return REGISTRY.register(Gauge(name, help, function=function))
+
+
+_ID_SEGMENT = re.compile(r"/(?!v\d+(?:/|$))[^/?]*\d[^/?]*")
+
+
+# Function to collapse IDs in an API path so each route is one label value
+def route(path: str) -> str:
+    return _ID_SEGMENT.sub("/{id}", path.split("?")[0])
+
+
+def _before_boto3_call(context, **kwargs):
+    context["instrumentation_start"] = time.perf_counter()
+    external_in_flight.inc("dynamodb")
+
+
+def _finish_boto3_call(event_name: str, context, ok: bool):
+    start = context.pop("instrumentation_start", None)
+    if start is None:
+        return
+    operation = event_name.rsplit(".", 1)[-1]
+    external_seconds.observe(time.perf_counter() - start, "dynamodb", operation)
+    external_in_flight.dec("dynamodb")
+    if not ok:
+        external_errors.inc("dynamodb", operation)
+
+
+def _after_boto3_call(event_name, context, http_response=None, **kwargs):
+    _finish_boto3_call(event_name, context, ok=http_response is None or http_response.status_code < 400)
+
+
+def _after_boto3_call_error(event_name, context, **kwargs):
+    _finish_boto3_call(event_name, context, ok=False)
+
+
+# Function to time every API call made through a boto3 DynamoDB client
+def instrument_dynamodb(client):
+    events = client.meta.events
+    events.register("before-call.dynamodb", _before_boto3_call)
+    events.register("after-call.dynamodb", _after_boto3_call)
+    events.register("after-call-error.dynamodb", _after_boto3_call_error)
@@ -1,3 +1,5 @@
+import asyncio
+import threading
 import time
 import json
 import re
@@ -5,6 +7,8 @@ import http.client
 import boto3
 from boto3.dynamodb.conditions import Key
 from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 import constant
 
@@ -13,6 +17,18 @@ import uuid
 import os
 import matchMakingAlgorithm
 import metrics
+import dynamoScan
+import profileStore
+import heartClient
+import matchJobs
+import recommendations
+import sessionStore
+import historyBuffer
+import cache
+import channelCategories
+import writeBehind
+import schatStream
+import instrumentation
 
 
 app = FastAPI()
@@ -25,19 +41,87 @@ adminid = os.getenv("ADMIN_ID")
 heart_api_url = os.getenv("HEART_API_URL")
 bearer_token = os.getenv("HEART_BEARER_TOKEN")
 
+# Shared keep-alive connection pool for every Heart API call
+heart_client = heartClient.HeartClient(
+    heart_api_url,
+    bearer_token,
+    timeout=float(os.getenv("HEART_API_TIMEOUT", "10")),
+    max_connections=int(os.getenv("HEART_API_MAX_CONNECTIONS", "20")),
+    max_concurrency=int(os.getenv("HEART_API_MAX_CONCURRENCY", "20"))
+)
+
+
+# Stream schat replies and send them sentence by sentence (needs a schat build with the streaming endpoint)
+SCHAT_STREAMING = os.getenv("SCHAT_STREAMING", "false").lower() == "true"
+schat_stream = schatStream.SchatStreamClient(
+    schat_url,
+    path=os.getenv("SCHAT_STREAM_PATH", "/chat/stream"),
+    timeout=float(os.getenv("SCHAT_STREAM_TIMEOUT", "60"))
+)
+
+# Work started by a request that finishes after its response (awaited on shutdown)
+background_tasks = set()
+
 
 # Initialize DynamoDB client
 dynamodb = boto3.resource('dynamodb', region_name=AWS_REGION)
 tableChat = dynamodb.Table('ChatMessages')
 tableProfile = dynamodb.Table('UserProfiles')
-
-
-# State variables
-# Note: In a production environment, you'd want to use a database or cache for these
-awaiting_email = False
-awaiting_chat_confirmation = False
-user_email = None
-channel_category_id = None
+instrumentation.instrument_dynamodb(dynamodb.meta.client)
+instrumentation.instrument_dynamodb(metrics.dynamodb.meta.client)
+
+# Per-chat conversation state is shared through this DynamoDB table when several workers serve the app
+SESSION_TABLE = os.getenv("SESSION_TABLE")
+
+# In-memory copy of UserProfiles served to the matchmaker (0 disables the periodic delta refresh).
+# With several workers it refreshes by default; set PROFILE_REFRESH_INDEX so that isn't a full Scan.
+PROFILE_REFRESH_INTERVAL = float(os.getenv("PROFILE_REFRESH_INTERVAL", "60" if SESSION_TABLE else "0"))
+profile_store = profileStore.ProfileStore(
+    tableProfile,
+    refresh_interval=PROFILE_REFRESH_INTERVAL,
+    index_name=os.getenv("PROFILE_REFRESH_INDEX")
+)
+
+# Precomputed top-N matches (batch refresh runs in this process only when the interval is set)
+RECOMMENDATIONS_TABLE = os.getenv("RECOMMENDATIONS_TABLE")
+recommendation_table = recommendations.RecommendationTable(
+    profile_store,
+    top_n=int(os.getenv("RECOMMENDATION_TOP_N", "20")),
+    table=dynamodb.Table(RECOMMENDATIONS_TABLE) if RECOMMENDATIONS_TABLE else None,
+    refresh_interval=float(os.getenv("RECOMMENDATION_REFRESH_INTERVAL", "0"))
+)
+
+
+# Chat message and profile writes are queued and flushed with batch_writer off the request path
+write_behind = writeBehind.WriteBehindQueue(
+    flush_size=int(os.getenv("WRITE_BEHIND_FLUSH_SIZE", "25")),
+    flush_interval=float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", "1.0"))
+)
+
+# Message counters kept current on write; other workers' messages are counted only with an HourBucket index
+message_metrics = metrics.MessageMetrics(
+    tableChat,
+    admin_id=adminid,
+    checkpoint_path=os.getenv("MESSAGE_METRICS_CHECKPOINT"),
+    index_name=os.getenv("MESSAGE_METRICS_INDEX"),
+    refresh_interval=float(os.getenv("MESSAGE_METRICS_REFRESH_INTERVAL", "0"))
+)
+
+# Last turns of every active chat, written through on store and loaded from DynamoDB on a miss.
+# With several workers (SESSION_TABLE) another worker may have handled the last turn, so every read reloads.
+HISTORY_TURNS = 20
+conversation_history_buffer = historyBuffer.ConversationHistory(
+    turns=HISTORY_TURNS,
+    max_bytes=int(os.getenv("HISTORY_BUFFER_MAX_BYTES", str(64 * 1024 * 1024))),
+    reload_after=float(os.getenv("HISTORY_BUFFER_RELOAD_AFTER", "0" if SESSION_TABLE else "600"))
+)
+
+# Per-chat conversation state; a DynamoDB table lets several workers share it
+SESSION_TTL = float(os.getenv("SESSION_TTL", "86400"))
+if SESSION_TABLE:
+    session_store = sessionStore.DynamoSessionStore(dynamodb.Table(SESSION_TABLE), ttl=SESSION_TTL)
+else:
+    session_store = sessionStore.InMemorySessionStore(ttl=SESSION_TTL)
 
 class MessageRequest(BaseModel):
 
@@ -53,67 +137,76 @@ def strip_html_tags(text: str) -> str:
     return re.sub(r'<[^>]+>', '', text)
 
 
-def get_user_from_id(user_id: str) -> Optional[str]:
+async def fetch_user_from_id(user_id: str) -> Optional[dict]:
     try:
-        conn = http.client.HTTPSConnection(heart_api_url)
-        headers = {
-            'authorization': f'Bearer {bearer_token}',
-            'content-type': 'application/json'
-        }
-        conn.request("GET", f"/v0/users/{user_id}", headers=headers)
-        res = conn.getresponse()
-        data = res.read()
+        data = await heart_client.request("GET", f"/v0/users/{user_id}")
 
-        user = json.loads(data.decode("utf-8"))
+        user = json.loads(data)
         return user
 
     except Exception as e:
         print(f"Error fetching user: {e}")
         return None
 
-def check_if_channel_category_exists(name: str):
-    try:
-        conn = http.client.HTTPSConnection(heart_api_url)
-        headers = {
-            'authorization': f'Bearer {bearer_token}',
-            'accept': 'application/json'
-        }
-        conn.request("GET", "/v0/channelCategories", headers=headers)
-        res = conn.getresponse()
-        data = res.read()
 
-        channel_categories = json.loads(data.decode("utf-8"))
+# Heart users rarely change, so lookups are cached and concurrent ones share a request
+user_cache = cache.AsyncLoadingCache(
+    fetch_user_from_id,
+    maxsize=int(os.getenv("USER_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("USER_CACHE_TTL", "300"))
+)
 
-        for category in channel_categories:
-            if category['name'] == name:
-                return category['id']
 
-        return None
+async def get_user_from_id(user_id: str) -> Optional[dict]:
+    return await user_cache.get(user_id)
+
+async def list_channel_categories() -> Optional[list]:
+    try:
+        data = await heart_client.request("GET", "/v0/channelCategories")
+
+        return json.loads(data)
 
     except Exception as e:
         print(f"Error fetching channel categories: {e}")
         return None
 
+async def check_if_channel_category_exists(name: str):
+    return await channel_categories.lookup(name)
+
+
+
+# Channel category IDs by name, listed from Heart once and created on demand
+channel_categories = channelCategories.ChannelCategoryResolver(
+    list_channel_categories,
+    lambda name: create_channel_category(name),
+    ttl=float(os.getenv("CHANNEL_CATEGORY_TTL", "3600"))
+)
+
+
+def load_recent_chat_messages(chat_id: str) -> list:
+    response = tableChat.query(
+        KeyConditionExpression=Key('ChatID').eq(chat_id),
+        ScanIndexForward=False,  # Sort in descending order (most recent first)
+        Limit=HISTORY_TURNS  # Limit to the last 20 messages
+    )
+    return list(reversed(response.get('Items', [])))  # Reverse to get chronological order
+
+
+# Function to format the chat's recent messages as schat conversation history
+def get_conversation_history(chat_id: str) -> list:
+    conversation_history = []
+    for item in conversation_history_buffer.get(chat_id, load_recent_chat_messages):
+        role = "assistant" if item['SenderUserID'] == adminid else "user"
+        conversation_history.append({
+            "role": role,
+            "content": item['MessageContent']
+        })
+    return conversation_history
 
 
 def get_ai_response(user_message: str, chat_id: str) -> Optional[str]:
     try:
-        response = tableChat.query(
-            KeyConditionExpression=Key('ChatID').eq(chat_id),
-            ScanIndexForward=False,  # Sort in descending order (most recent first)
-            Limit=20  # Limit to last 10 messages
-        )
-        
-        # Format the conversation history
-        conversation_history = []
-        if 'Items' in response and response['Items']:
-            for item in reversed(response['Items']):  # Reverse to get chronological order
-                role = "assistant" if item['SenderUserID'] == adminid else "user"
-                conversation_history.append({
-                    "role": role,
-                    "content": item['MessageContent']
-                })
-        
+        conversation_history = get_conversation_history(chat_id)
 
         print(f"Conversation history: {conversation_history}")
         conn = http.client.HTTPConnection(schat_url)
@@ -124,9 +217,12 @@ def get_ai_response(user_message: str, chat_id: str) -> Optional[str]:
         headers = {
             'Content-Type': 'application/json'
         }
-        conn.request("POST", "/chat/", payload, headers)
-        res = conn.getresponse()
-        data = res.read()
+        with instrumentation.track("schat", "POST /chat/") as call:
+            conn.request("POST", "/chat/", payload, headers)
+            res = conn.getresponse()
+            data = res.read()
+            if res.status != 200:
+                call.failed()
         
         if res.status == 200:
             response_json = json.loads(data.decode("utf-8"))
@@ -140,16 +236,131 @@ def get_ai_response(user_message: str, chat_id: str) -> Optional[str]:
         return None
 
 
-def process_direct_message(sender_user_id: str, receiver_user_id: str, chat_id: str, chat_message_id: str) -> bool:
+async def stream_ai_response(user_message: str, chat_id: str, sender_user_id: str) -> Optional[dict]:
+    """
+    Stream the schat reply to the user as direct messages, one sentence at a time.
+
+    Returns:
+    - The final {"assistant_response", "user_profile"} dict, or None if nothing was sent.
+    """
+    try:
+        conversation_history = await run_in_threadpool(get_conversation_history, chat_id)
+    except Exception as e:
+        print(f"Error loading conversation history: {e}")
+        return None
+
+    payload = {
+        "user_message": user_message,
+        "conversation_history": conversation_history
+    }
+    return await schat_stream.stream_reply(payload, lambda sentence: send_direct_message(sender_user_id, adminid, sentence))
+
+
+# Function to run work after the response (e.g. profile storage), keeping a reference until it finishes
+def run_in_background(coroutine):
+    task = asyncio.ensure_future(coroutine)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+
+async def run_match_job(job: matchJobs.MatchJob) -> dict:
+
+    sender_user_id = job.user_id
+
+    # Precomputed recommendations turn matching into a keyed lookup
+    recommended = await run_in_threadpool(recommendation_table.lookup, sender_user_id)
+    if recommended:
+        res = {"top_match": recommended[0], "top_matches": recommended}
+    else:
+        res = await run_in_threadpool(matchMakingAlgorithm.run_matchmaking_algorithm, sender_user_id, profile_store)
+    print(f"Matchmaking result: {res}")
+
+    matched_user_id = res.get('top_match')
+    # explanation = matchMakingAlgorithm.give_explanation(sender_user_id, matched_user_id, tableProfile)
+
+    print(f"Matched user ID: {matched_user_id}")
+    if not matched_user_id:
+        await send_direct_message(sender_user_id, adminid, "No matches found. Please try again later.🥺")
+        return {"top_match": None}
+
+    # Look up the category, creating it if it doesn't exist
+    channel_category_id = await channel_categories.resolve("Matches")
+
+    chat_channel_id = None
+    if channel_category_id:
+        chat_channel_id = await create_chat_channel(channel_category_id, sender_user_id, matched_user_id[0], adminid)
+        if not chat_channel_id:
+            # The cached ID may belong to a deleted category; re-list before the next match
+            channel_categories.invalidate("Matches")
+        print(f"Chat channel created with ID: {chat_channel_id}")
+        await send_direct_message(sender_user_id, adminid, "Match Found 💖, Find your match in the Matches channel")
+        # send_direct_message_channel(chat_channel_id, adminid, explanation)
+
+        print(f"Match channel created for user {sender_user_id} in category {channel_category_id}.")
+    else:
+        print("Failed to create channel category for matches.")
+
+    return {
+        "top_match": matched_user_id[0],
+        "compatibility_score": matched_user_id[1],
+        "top_matches": res.get('top_matches'),
+        "channel_id": chat_channel_id
+    }
+
+
+# Function to tell the user their match job failed, so "Finding a match..." isn't left hanging
+async def report_match_job_failure(job: matchJobs.MatchJob):
+    await send_direct_message(job.user_id, adminid, "Sorry, something went wrong while finding your match. Please try again later.🥺")
+
+
+# Matchmaking runs on a bounded pool of background workers, one active job per user
+match_jobs = matchJobs.MatchJobQueue(
+    run_match_job,
+    on_failure=report_match_job_failure,
+    workers=int(os.getenv("MATCH_JOB_WORKERS", "2")),
+    max_queued=int(os.getenv("MATCH_JOB_MAX_QUEUED", "100"))
+)
+
+
+async def process_direct_message(sender_user_id: str, receiver_user_id: str, chat_id: str, chat_message_id: str) -> bool:
+    with instrumentation.timed("process_direct_message") as call:
+        success = await process_direct_message_with_session(sender_user_id, receiver_user_id, chat_id, chat_message_id)
+        if not success:
+            call.failed()
+        return success
 
-    global awaiting_email, awaiting_chat_confirmation, user_email, channel_category_id
+
+async def process_direct_message_with_session(sender_user_id: str, receiver_user_id: str, chat_id: str, chat_message_id: str) -> bool:
+    try:
+        session, version = await run_in_threadpool(session_store.load, chat_id)
+    except Exception as e:
+        print(f"Error loading session state: {e}")
+        return False
+
+    original_session = dict(session)
+    success = await handle_direct_message(session, sender_user_id, receiver_user_id, chat_id, chat_message_id)
+
+    if session != original_session:
+        try:
+            saved = await run_in_threadpool(session_store.save, chat_id, session, version)
+            if not saved:
+                print(f"Session state for chat {chat_id} was updated concurrently; keeping the other update")
+        except Exception as e:
+            print(f"Error saving session state: {e}")
+            return False
+
+    return success
+
+
+async def handle_direct_message(session: dict, sender_user_id: str, receiver_user_id: str, chat_id: str, chat_message_id: str) -> bool:
 
     try:
         print(f"Processing message from {sender_user_id} to {receiver_user_id}")
         print(f"Chat ID: {chat_id}, Message ID: {chat_message_id}")
 
-        user_email = get_user_from_id(sender_user_id).get('email')
-        recent_messages = get_recent_messages(chat_id)
+        user_email = (await get_user_from_id(sender_user_id)).get('email')
+        recent_messages = await get_recent_messages(chat_id)
 
         if recent_messages and 'content' in recent_messages[-1]:
             latest_message_content = recent_messages[-1]['content'].strip().lower()
@@ -158,50 +369,41 @@ def process_direct_message(sender_user_id: str, receiver_user_id: str, chat_id:
 
 
             if clean_message_content == "i want to get matched":
-                send_direct_message(sender_user_id, adminid, "Finding a match for you... May take a few seconds.")
-                res = matchMakingAlgorithm.run_matchmaking_algorithm(sender_user_id, tableProfile)
-                print(f"Matchmaking result: {res}")
-
-                matched_user_id = res.get('top_match')
-                # explanation = matchMakingAlgorithm.give_explanation(sender_user_id, matched_user_id, tableProfile)
-        
-                print(f"Matched user ID: {matched_user_id}")
-                if not matched_user_id:
-                    send_direct_message(sender_user_id, adminid, "No matches found. Please try again later.🥺")
+                try:
+                    job, created = match_jobs.submit(sender_user_id, chat_id=chat_id)
+                except asyncio.QueueFull:
+                    await send_direct_message(sender_user_id, adminid, "Lots of people are looking for love right now! Please try again in a minute.")
                     return True
-                                
-                channel_category_id = check_if_channel_category_exists("Matches")
-
-                # If the category doesn't exist, create it
-                if not channel_category_id:
-                    channel_category_id = create_channel_category("Matches")
 
-                if channel_category_id:
-                    chat_channel_id = create_chat_channel(channel_category_id, sender_user_id, matched_user_id[0], adminid)
-                    print(f"Chat channel created with ID: {chat_channel_id}")
-                    send_direct_message(sender_user_id, adminid, "Match Found 💖, Find your match in the Matches channel")
-                    # send_direct_message_channel(chat_channel_id, adminid, explanation)
-
-                    print(f"Match channel created for user {sender_user_id} in category {channel_category_id}.")
-                else:
-                    print("Failed to create channel category for matches.")
-                
+                if created:
+                    await send_direct_message(sender_user_id, adminid, "Finding a match for you... May take a few seconds.")
+                print(f"Match job {job.id} for user {sender_user_id} is {job.status}")
                 return True
             
-            ai_response = get_ai_response(clean_message_content, chat_id)
-            if ai_response:
-                send_direct_message(sender_user_id, adminid, ai_response['assistant_response'])
+            if SCHAT_STREAMING:
+                # Sentences go out as they are generated, so the user sees the first one early
+                ai_response = await stream_ai_response(clean_message_content, chat_id, sender_user_id)
+            else:
+                ai_response = await run_in_threadpool(get_ai_response, clean_message_content, chat_id)
+                if ai_response:
+                    await send_direct_message(sender_user_id, adminid, ai_response['assistant_response'])
 
+            if ai_response:
                 # Store messages in dynamoDb
                 store_message_in_dynamodb(chat_id, chat_message_id, clean_message_content, sender_user_id)
                 store_message_in_dynamodb(chat_id, generate_message_id(), ai_response['assistant_response'], adminid)
-                store_user_profile_in_dynamodb(sender_user_id, ai_response['user_profile'])
+
+                if not SCHAT_STREAMING:
+                    await run_in_threadpool(store_user_profile_in_dynamodb, sender_user_id, ai_response['user_profile'])
+                elif ai_response.get('user_profile') is not None:
+                    # The extracted profile is applied after the reply has been sent
+                    run_in_background(run_in_threadpool(store_user_profile_in_dynamodb, sender_user_id, ai_response['user_profile']))
 
                 return True
             else:
                 print("Failed to get AI response, falling back to default behavior")
 
-        if awaiting_email:
+        if session["awaiting_email"]:
             if recent_messages and 'content' in recent_messages[-1]:
                 latest_message_content = recent_messages[-1]['content'].strip().lower()
                 clean_message_content = strip_html_tags(latest_message_content)
@@ -209,27 +411,27 @@ def process_direct_message(sender_user_id: str, receiver_user_id: str, chat_id:
                 print(f"Latest message content (cleaned): {clean_message_content}")
 
                 if "@" in clean_message_content:
-                    user_email = clean_message_content
+                    session["user_email"] = clean_message_content
 
-                    print(f"User email captured: {user_email}")
-                    channel_category_id = create_channel_category(f"Matches for {user_email}")
+                    print(f"User email captured: {session['user_email']}")
+                    session["channel_category_id"] = await create_channel_category(f"Matches for {session['user_email']}")
 
-                    print(f"Channel category created with ID: {channel_category_id}")
+                    print(f"Channel category created with ID: {session['channel_category_id']}")
                     response_text = "Do you want to chat with the match?"
-                    send_direct_message(sender_user_id, adminid, response_text)
+                    await send_direct_message(sender_user_id, adminid, response_text)
                     store_message_in_dynamodb(chat_id, generate_message_id(), response_text, adminid)
-                    awaiting_chat_confirmation = True
-                    awaiting_email = False
+                    session["awaiting_chat_confirmation"] = True
+                    session["awaiting_email"] = False
                     return True
                 else:
                     print("Invalid email format. Awaiting correct email.")
                     response_text = "Please provide a valid email."
-                    send_direct_message(sender_user_id, adminid, response_text)
+                    await send_direct_message(sender_user_id, adminid, response_text)
                     store_message_in_dynamodb(chat_id, generate_message_id(), response_text, adminid)
                     return True
 
 
-        if awaiting_chat_confirmation:
+        if session["awaiting_chat_confirmation"]:
             if recent_messages and 'content' in recent_messages[-1]:
                 latest_message_content = recent_messages[-1]['content'].strip().lower()
                 clean_message_content = strip_html_tags(latest_message_content)
@@ -237,22 +439,22 @@ def process_direct_message(sender_user_id: str, receiver_user_id: str, chat_id:
                 print(f"Latest message content (cleaned): {clean_message_content}")
 
                 if clean_message_content == "yes":
-                    create_chat_channel(channel_category_id, user_email, sender_user_id)
+                    await create_chat_channel(session["channel_category_id"], session["user_email"] or user_email, sender_user_id)
 
                     response_text = "Chat channel created!"
-                    send_direct_message(sender_user_id, adminid, response_text)
+                    await send_direct_message(sender_user_id, adminid, response_text)
                     store_message_in_dynamodb(chat_id, generate_message_id(), response_text, adminid)
-                    awaiting_chat_confirmation = False
+                    session["awaiting_chat_confirmation"] = False
                     return True
                 else:
                     response_text = "Okay, let me know if you change your mind."
-                    send_direct_message(sender_user_id, adminid, response_text)
+                    await send_direct_message(sender_user_id, adminid, response_text)
                     store_message_in_dynamodb(chat_id, generate_message_id(), response_text, adminid)
-                    awaiting_chat_confirmation = False
+                    session["awaiting_chat_confirmation"] = False
                     return True
 
         default_message = 'I am a matchmaker. Give me information about you so I can match you.'
-        send_direct_message(sender_user_id, adminid, default_message)
+        await send_direct_message(sender_user_id, adminid, default_message)
         store_message_in_dynamodb(chat_id, generate_message_id(), default_message, adminid)
 
         return True
@@ -262,78 +464,79 @@ def process_direct_message(sender_user_id: str, receiver_user_id: str, chat_id:
         return False
 
 
+# Last message Timestamp handed out, so queued messages never share a (ChatID, Timestamp) key
+_last_message_timestamp = 0
+_message_timestamp_lock = threading.Lock()
+
+
+def next_message_timestamp() -> int:
+    global _last_message_timestamp
+    with _message_timestamp_lock:
+        _last_message_timestamp = max(int(time.time() * 1000), _last_message_timestamp + 1)
+        return _last_message_timestamp
+
+
 def store_message_in_dynamodb(chat_id: str, message_id: str, message_content: str, sender_user_id: str):
-    timestamp = int(time.time() * 1000)  # Current time in milliseconds
+    timestamp = next_message_timestamp()  # Current time in milliseconds
     try:
-        tableChat.put_item(
-            Item={
-                'ChatID': chat_id,
-                'Timestamp': timestamp,
-                'MessageID': message_id,
-                'MessageContent': message_content,
-                'SenderUserID': sender_user_id
-            }
-        )
-        print(f"Stored message in DynamoDB: ChatID={chat_id}, MessageID={message_id}, SenderUserID={sender_user_id}")
+        item = {
+            'ChatID': chat_id,
+            'Timestamp': timestamp,
+            'MessageID': message_id,
+            'MessageContent': message_content,
+            'SenderUserID': sender_user_id
+        }
+        if message_metrics.index_name:
+            item['HourBucket'] = dynamoScan.hour_bucket(timestamp)
+        write_behind.put(tableChat, item, ['ChatID', 'Timestamp'])
+        conversation_history_buffer.append(chat_id, item)
+        message_metrics.record(item)
+        print(f"Queued message for DynamoDB: ChatID={chat_id}, MessageID={message_id}, SenderUserID={sender_user_id}")
     except Exception as e:
         print(f"Error storing message in DynamoDB: {e}")
 
 
 def store_user_profile_in_dynamodb(user_id: str, user_profile: dict):
     try:
-        tableProfile.put_item(
-            Item={
-                'UserID': user_id,
-                'UserProfile': user_profile
-            }
-        )
-        print(f"Stored user profile in DynamoDB: UserID={user_id}")
+        item = {
+            'UserID': user_id,
+            'UserProfile': user_profile,
+            'UpdatedAt': int(time.time() * 1000)
+        }
+        if profile_store.index_name:
+            item['HourBucket'] = dynamoScan.hour_bucket(item['UpdatedAt'])
+        write_behind.put(tableProfile, item, ['UserID'])
+        profile_store.put(item)
+        matchMakingAlgorithm.weights_cache.invalidate(user_id, user_profile)
+        print(f"Queued user profile for DynamoDB: UserID={user_id}")
     except Exception as e:
         print(f"Error storing user profile in DynamoDB: {e}")
 
 
 
-def send_direct_message(to_user: str, from_user: str, text: str) -> Optional[str]:
+async def send_direct_message(to_user: str, from_user: str, text: str) -> Optional[str]:
     try:
         print(f"Sending message from {from_user} to {to_user}")
-        conn = http.client.HTTPSConnection(heart_api_url)
-        payload = json.dumps({
+        payload = {
             "from": from_user,
             "to": to_user,
             "text": format_text(text)
-        })
-        headers = {
-            'authorization': f'Bearer {bearer_token}',
-            'content-type': 'application/json'
         }
 
-        conn.request("PUT", "/v0/directMessages", payload, headers)
-        res = conn.getresponse()
-        data = res.read()
-
-        return data.decode("utf-8")
+        return await heart_client.request("PUT", "/v0/directMessages", payload)
 
     except Exception as e:
         print(f"Error sending direct message: {e}")
         return None
 
-def send_direct_message_channel(channel_id: str, from_user: str, text: str) -> Optional[str]:
+async def send_direct_message_channel(channel_id: str, from_user: str, text: str) -> Optional[str]:
     try:
-        conn = http.client.HTTPSConnection(heart_api_url)
-        payload = json.dumps({
+        payload = {
             "from": from_user,
             "text": format_text(text)
-        })
-        headers = {
-            'authorization': f'Bearer {bearer_token}',
-            'content-type': 'application/json'
         }
 
-        conn.request("PUT", f"/v0/chatChannel/{channel_id}/message", payload, headers)
-        res = conn.getresponse()
-        data = res.read()
-
-        return data.decode("utf-8")
+        return await heart_client.request("PUT", f"/v0/chatChannel/{channel_id}/message", payload)
 
     except Exception as e:
         print(f"Error sending direct message: {e}")
@@ -343,22 +546,13 @@ def send_direct_message_channel(channel_id: str, from_user: str, text: str) -> O
 def format_text(text: str) -> str:
     return "<p>" + text + "</p>"
 
-def get_recent_messages(chat_id: str) -> list:
+async def get_recent_messages(chat_id: str) -> list:
 
     try:
 
-        conn = http.client.HTTPSConnection(heart_api_url)
-
-        headers = {
-            'authorization': f'Bearer {bearer_token}',
-            'accept': 'application/json'
-        }
-
-        conn.request("GET", f"/v0/directMessages/{chat_id}", headers=headers)
-        res = conn.getresponse()
-        data = res.read()
+        data = await heart_client.request("GET", f"/v0/directMessages/{chat_id}")
 
-        messages = json.loads(data.decode("utf-8"))
+        messages = json.loads(data)
 
         if isinstance(messages, list):
             return messages
@@ -372,22 +566,15 @@ def get_recent_messages(chat_id: str) -> list:
         return []
 
 
-def create_channel_category(name: str) -> Optional[str]:
+async def create_channel_category(name: str) -> Optional[str]:
     try:
-        conn = http.client.HTTPSConnection(heart_api_url)
-        payload = json.dumps({
+        payload = {
             "name": name
-        })
-        headers = {
-            'authorization': f'Bearer {bearer_token}',
-            'content-type': 'application/json'
         }
-        conn.request("PUT", "/v0/channelCategories", payload, headers)
-        res = conn.getresponse()
-        data = res.read()
+        data = await heart_client.request("PUT", "/v0/channelCategories", payload)
 
-        print(f"Create channel category response: {data.decode('utf-8')}")
-        response_json = json.loads(data.decode("utf-8"))
+        print(f"Create channel category response: {data}")
+        response_json = json.loads(data)
         return response_json.get('id')
 
     except Exception as e:
@@ -395,18 +582,22 @@ def create_channel_category(name: str) -> Optional[str]:
         return None
 
 
-def create_chat_channel(channel_category_id: str, sender_user_id: str, matched_user_id: str, adminid: str) -> Optional[str]:
+async def create_chat_channel(channel_category_id: str, sender_user_id: str, matched_user_id: str, adminid: str) -> Optional[str]:
     try:
-        user_email = get_user_from_id(sender_user_id).get('email')
-        admin_email = get_user_from_id(adminid).get('email')
-        matched_user_email = get_user_from_id(matched_user_id).get('email')
+        user, admin, matched_user = await asyncio.gather(
+            get_user_from_id(sender_user_id),
+            get_user_from_id(adminid),
+            get_user_from_id(matched_user_id)
+        )
 
-        matched_user_name = get_user_from_id(matched_user_id).get('name')
-        user_name = get_user_from_id(sender_user_id).get('name')
+        user_email = user.get('email')
+        admin_email = admin.get('email')
+        matched_user_email = matched_user.get('email')
 
+        matched_user_name = matched_user.get('name')
+        user_name = user.get('name')
 
-        conn = http.client.HTTPSConnection(heart_api_url)
-        payload = json.dumps({
+        payload = {
             "isPrivate": True,
             "channelCategoryID": channel_category_id,
             "name": f"{matched_user_name} ❤️ {user_name}",
@@ -417,15 +608,9 @@ def create_chat_channel(channel_category_id: str, sender_user_id: str, matched_u
                 matched_user_email
             ],
             "channelType": "CHAT"
-        })
-        headers = {
-            'authorization': f'Bearer {bearer_token}',
-            'content-type': 'application/json'
         }
-        conn.request("PUT", "/v0/channels", payload, headers)
-        res = conn.getresponse()
-        data = res.read()
-        response_json = json.loads(data.decode("utf-8"))
+        data = await heart_client.request("PUT", "/v0/channels", payload)
+        response_json = json.loads(data)
         return response_json.get('channelID')
 
     except Exception as e:
@@ -436,11 +621,37 @@ def create_chat_channel(channel_category_id: str, sender_user_id: str, matched_u
 def generate_message_id() -> str:
     return str(uuid.uuid4())
 
+@app.on_event("startup")
+async def startup():
+    write_behind.start()
+    profile_store.start()
+    recommendation_table.start()
+    message_metrics.start()
+    matchMakingAlgorithm.pair_scores.start(float(os.getenv("PAIR_SCORE_RELOAD_INTERVAL", "300")))
+    await match_jobs.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await match_jobs.stop()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    recommendation_table.stop()
+    profile_store.stop()
+    write_behind.stop()
+    message_metrics.stop()
+    await heart_client.aclose()
+    await schat_stream.aclose()
+    matchMakingAlgorithm.pair_scores.stop()
+    matchMakingAlgorithm.pair_scores.save()
+
+# Queue depths are read when /metrics is scraped
+instrumentation.register_gauge("write_behind_queue_depth", "DynamoDB writes queued but not yet flushed.", write_behind.depth)
+instrumentation.register_gauge("match_job_queue_depth", "Match jobs waiting for a worker.", match_jobs.depth)
+
 # API Endpoints
 @app.post("/process_message")
 async def process_message(message: MessageRequest):
     try:
-        success = process_direct_message(message.senderUserID, adminid, message.chatID, message.chatMessageID)
+        success = await process_direct_message(message.senderUserID, adminid, message.chatID, message.chatMessageID)
         if success:
             return {"success": True, "message": "Message processed successfully"}
         else:
@@ -449,16 +660,25 @@ async def process_message(message: MessageRequest):
         print(f"Error in process_message: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/match_jobs/{job_id}")
+async def get_match_job(job_id: str):
+    job = match_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Match job not found")
+    return job.to_dict()
+
 @app.get("/get_messages")
 async def get_messages():
     try:
-        messages = metrics.get_all_messages()
-        length = len(messages)
-        return {"length": length}
+        return message_metrics.snapshot()
     except Exception as e:
         print(f"Error in get_messages: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/metrics")
+async def get_metrics():
+    return PlainTextResponse(instrumentation.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 async def root():
     return {"message": "Hello World"}
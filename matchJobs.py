@@ -0,0 +1,117 @@
+import asyncio
+import time
+import uuid
+
+from cache import LRUCache
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class MatchJob:
+    def __init__(self, user_id: str, params: dict):
+        self.id = str(uuid.uuid4())
+        self.user_id = user_id
+        self.params = params
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "user_id": self.user_id,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+
+
+class MatchJobQueue:
+    """
+    Bounded pool of asyncio workers running match jobs off the request path.
+    If a handler raises, the job is marked failed and `await on_failure(job)`
+    is called, so the user can be told.
+
+    A user has at most one queued or running job; submitting again returns
+    that job instead of creating a second one. Finished jobs are kept in an
+    LRU so their status can still be looked up.
+    """
+
+    def __init__(self, handler, workers: int = 2, max_queued: int = 100, history: int = 1000, on_failure=None):
+        self.handler = handler
+        self.on_failure = on_failure
+        self.workers = workers
+        self.max_queued = max_queued
+        self._jobs = LRUCache(history)
+        self._active = {}
+        self._queue = None
+        self._tasks = []
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, user_id: str, **params):
+        """
+        Queue a match job for a user, deduplicating against their active job.
+
+        Returns:
+        - A (job, created) tuple; created is False when an existing job was returned.
+
+        Raises:
+        - asyncio.QueueFull when the queue is at capacity.
+        """
+        active_job = self._active.get(user_id)
+        if active_job is not None:
+            return active_job, False
+
+        job = MatchJob(user_id, params)
+        self._queue.put_nowait(job)
+        self._active[user_id] = job
+        self._jobs.set(job.id, job)
+        return job, True
+
+    def get(self, job_id: str):
+        return self._jobs.get(job_id)
+
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            job.status = RUNNING
+            job.started_at = time.time()
+            try:
+                job.result = await self.handler(job)
+                job.status = DONE
+            except Exception as e:
+                print(f"Error running match job {job.id}: {e}")
+                job.error = str(e)
+                job.status = FAILED
+                if self.on_failure is not None:
+                    try:
+                        await self.on_failure(job)
+                    except Exception as e:
+                        print(f"Error reporting failed match job {job.id}: {e}")
+            finally:
+                job.finished_at = time.time()
+                self._active.pop(job.user_id, None)
+                self._queue.task_done()
@@ -1,17 +1,287 @@
 import json
-from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import boto3
 import openai
 import os
+import cache
+import scoring
+import candidateIndex
+import profileStore
+import profiles
+import dynamoScan
+import weightsCache
+import scoreStore
+import embeddingIndex
+import instrumentation
+import openaiClient
 
 # Load OpenAI API key from environment
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 openai.api_key = OPENAI_API_KEY
+# openai_client below does the retrying, so it sees every 429; the SDK's own retries would hide them
+openai.max_retries = 0
+OPENAI_MODEL = "gpt-4o-mini"
+
+AWS_REGION = "us-east-1"  # Replace with your preferred AWS region
+dynamodb = boto3.resource('dynamodb', region_name=AWS_REGION)
+instrumentation.instrument_dynamodb(dynamodb.meta.client)
+
+# Number of best local matches returned (and optionally reranked by the LLM)
+MATCH_TOP_K = int(os.getenv("MATCH_TOP_K", "10"))
+MATCH_LLM_RERANK = os.getenv("MATCH_LLM_RERANK", "false").lower() == "true"
+
+# Rerank by scoring blocks of candidates in one request (false: one request per candidate)
+MATCH_PACKED_SCORING = os.getenv("MATCH_PACKED_SCORING", "true").lower() == "true"
+MATCH_SCORE_BLOCK_SIZE = int(os.getenv("MATCH_SCORE_BLOCK_SIZE", "25"))
+
+# Candidates shortlisted for the LLM rerank, and the attribute stages it prunes between
+MATCH_RERANK_POOL = int(os.getenv("MATCH_RERANK_POOL", "50"))
+MATCH_BOUND_STAGES = int(os.getenv("MATCH_BOUND_STAGES", "3"))
+
+# When set, only the K profiles with the most similar free text are scored (0 scores every candidate)
+MATCH_ANN_TOP_K = int(os.getenv("MATCH_ANN_TOP_K", "0"))
+
+# Feature matrix shared across match requests, re-encoding only changed profiles
+profile_matrix = scoring.ProfileMatrix()
+
+# Dealbreaker bitmaps used to prune the candidate pool before scoring
+candidate_index = candidateIndex.CandidateIndex()
+
+# Approximate-nearest-neighbour index over the free-text profile fields
+embedding_index = embeddingIndex.EmbeddingIndex()
+
+# Dynamic weights cached by profile content (optionally backed by a directory or DynamoDB table)
+WEIGHTS_CACHE_TABLE = os.getenv("WEIGHTS_CACHE_TABLE")
+weights_cache = weightsCache.WeightsCache(
+    maxsize=int(os.getenv("WEIGHTS_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("WEIGHTS_CACHE_TTL", "86400")),
+    directory=os.getenv("WEIGHTS_CACHE_DIR"),
+    table=dynamodb.Table(WEIGHTS_CACHE_TABLE) if WEIGHTS_CACHE_TABLE else None
+)
+
+# Memoised (attribute, value, value) scores from the LLM, persisted to PAIR_SCORE_PATH on shutdown
+pair_scores = scoreStore.PairScoreStore(
+    maxsize=int(os.getenv("PAIR_SCORE_CACHE_SIZE", "100000")),
+    path=os.getenv("PAIR_SCORE_PATH")
+)
+pair_scores.load()
+
+# How long a run waits for a pair score another run is computing before scoring it as neutral
+PAIR_SCORE_WAIT_TIMEOUT = float(os.getenv("PAIR_SCORE_WAIT_TIMEOUT", "120"))
+
+# Concurrent runs against a plain table share one scan of it for this many seconds
+MATCH_SNAPSHOT_TTL = float(os.getenv("MATCH_SNAPSHOT_TTL", "30"))
+
+# Every OpenAI call goes through one rate-limited, adaptively concurrent client
+openai_client = openaiClient.GovernedOpenAIClient(
+    lambda **kwargs: openai.chat.completions.create(**kwargs),
+    rpm=float(os.getenv("OPENAI_RPM", "500")),
+    tpm=float(os.getenv("OPENAI_TPM", "200000")),
+    max_concurrency=int(os.getenv("OPENAI_MAX_CONCURRENCY", "16")),
+    max_retries=int(os.getenv("OPENAI_MAX_RETRIES", "5"))
+)
+instrumentation.register_gauge(
+    "openai_concurrency_limit", "Current adaptive limit on concurrent OpenAI calls.", lambda: openai_client.limit)
+
+# Profile store currently pushing its changes into the index and matrix
+_attached_store = None
+_attach_lock = threading.Lock()
+
+# Matchmaking JSON schema for a single attribute comparison
+MATCHMAKING_SCORE_SCHEMA = {
+    "name": "matchmaking_score",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "compatibility_score": {"type": "integer"}
+        },
+        "required": ["compatibility_score"],
+        "additionalProperties": False
+    }
+}
+
+MATCHMAKING_SYSTEM_PROMPT = '''You're an expert matchmaker. You'll be given attributes from 2 different people's matchmaking profiles in JSON format, compare them and output a compatibility score (on a scale of 1 to 10).'''
+
+PACKED_SYSTEM_PROMPT = '''You're an expert matchmaker. You'll be given one person's matchmaking profile ("Person 1") and a list of candidates in JSON format. For every candidate, compare each listed attribute with Person 1's and output a compatibility score for that attribute (an integer from 1 to 10). Return one entry per candidate, using the candidate's label.'''
+
+
+# Function to build the JSON schema for a packed request scoring the given attributes
+def packed_score_schema(attributes: list) -> dict:
+    return {
+        "name": "packed_matchmaking_scores",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "candidates": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "candidate": {"type": "string"},
+                            "scores": {
+                                "type": "object",
+                                "properties": {attribute: {"type": "integer"} for attribute in attributes},
+                                "required": list(attributes),
+                                "additionalProperties": False
+                            }
+                        },
+                        "required": ["candidate", "scores"],
+                        "additionalProperties": False
+                    }
+                }
+            },
+            "required": ["candidates"],
+            "additionalProperties": False
+        }
+    }
+
+
+# Function to return an LLM score if it is a number on the 1-10 scale, else None
+def valid_score(score):
+    if isinstance(score, (int, float)) and not isinstance(score, bool) and scoring.MIN_SCORE <= score <= scoring.MAX_SCORE:
+        return score
+    return None
+
+
+# Function to weigh a pair's LLM score, remembering it in pair_scores; a missing score counts as neutral
+def weighted_pair_score(attribute: str, value_1, value_2, score, weight: float) -> float:
+    if score is None:
+        # Keep the candidate, scoring what couldn't be compared as neutral
+        return scoring.NEUTRAL_SCORE * weight
+    pair_scores.set(attribute, value_1, value_2, score)
+    return score * weight
+
+
+def parse_packed_scores(response: str, labels: list, attributes: list) -> dict:
+    """
+    Validate a packed scoring response and map it back to candidate labels.
+
+    Returns:
+    - {label: {attribute: score}} with only well-formed 1-10 scores for known
+      labels and attributes; anything else is left out.
+    """
+    try:
+        entries = json.loads(response)["candidates"]
+    except (json.JSONDecodeError, KeyError, TypeError):
+        print("Error decoding packed scoring response.")
+        return {}
+
+    known = set(labels)
+    results = {}
+    for entry in entries if isinstance(entries, list) else []:
+        if not isinstance(entry, dict) or entry.get("candidate") not in known or not isinstance(entry.get("scores"), dict):
+            continue
+        scores = {}
+        for attribute in attributes:
+            score = valid_score(entry["scores"].get(attribute))
+            if score is not None:
+                scores[attribute] = score
+        results[entry["candidate"]] = scores
+    return results
+
+
+# Function to wait (PAIR_SCORE_WAIT_TIMEOUT in total) for pair scores being computed by other runs, scoring any that don't arrive as neutral
+def wait_for_shared_scores(waiting: list, weights: dict, compatibility_scores: dict):
+    deadline = time.monotonic() + PAIR_SCORE_WAIT_TIMEOUT
+    for user_id, attribute, future in waiting:
+        try:
+            score = future.result(timeout=max(deadline - time.monotonic(), 0))
+        except FutureTimeoutError:
+            score = None
+        if score is None:
+            score = scoring.NEUTRAL_SCORE
+        compatibility_scores[user_id] = compatibility_scores.get(user_id, 0) + score * weights[attribute]
+
+
+# Function to score one block of candidate Profiles against the user's Profile in a single request
+def score_candidate_block(user_profile: profiles.Profile, block: list, weights: dict) -> dict:
+    batch = profiles.ProfileBatch(block)
+    compatibility_scores = dict.fromkeys(batch.user_ids, 0)
+    pending = {}
+    waiting = []
+
+    for attribute, weight in weights.items():
+        value = user_profile.get(attribute)
+        for row, other_value in enumerate(batch.texts(attribute)):
+            # Reuse the score if this pair of values has been compared before
+            cached_score = pair_scores.get(attribute, value, other_value)
+            if cached_score is not None:
+                compatibility_scores[batch.user_ids[row]] += cached_score * weight
+                continue
+
+            # Another run (or an earlier candidate in this block) may already be scoring this pair
+            future = pair_scores.claim(attribute, value, other_value)
+            if future is None:
+                pending.setdefault(row, []).append(attribute)
+            else:
+                waiting.append((batch.user_ids[row], attribute, future))
+
+    if pending:
+        try:
+            score_pending_rows(user_profile, batch, pending, weights, compatibility_scores)
+        finally:
+            # Wake anyone waiting on a pair this request didn't get a score for
+            for row, uncached in pending.items():
+                for attribute in uncached:
+                    pair_scores.release(attribute, user_profile.get(attribute), batch.profiles[row].get(attribute))
+
+    wait_for_shared_scores(waiting, weights, compatibility_scores)
+    return compatibility_scores
+
+
+# Function to send the claimed (row, attribute) pairs of a block as one packed request
+def score_pending_rows(user_profile: profiles.Profile, batch: profiles.ProfileBatch, pending: dict, weights: dict, compatibility_scores: dict):
+    labels = {row: f"c{row + 1}" for row in sorted(pending)}
+    attributes = [attribute for attribute in weights if any(attribute in uncached for uncached in pending.values())]
+    content = {
+        "Person 1": {attribute: user_profile.get(attribute, "Not specified") for attribute in attributes},
+        "Candidates": [
+            {"candidate": label, "profile": {attribute: batch.profiles[row].get(attribute, "Not specified") for attribute in attributes}}
+            for row, label in labels.items()
+        ]
+    }
+    messages = [{
+        "role": "system",
+        "content": PACKED_SYSTEM_PROMPT
+    }, {
+        "role": "user",
+        "content": json.dumps(content)
+    }]
+
+    # A rerank is for a user waiting on their match, so it goes ahead of batch work
+    response = call_openai_assistant_batch(packed_score_schema(attributes), messages, priority=openaiClient.INTERACTIVE)
+    results = parse_packed_scores(response[0], list(labels.values()), attributes) if response else {}
+
+    for row, label in labels.items():
+        other_profile = batch.profiles[row]
+        scores = results.get(label, {})
+        for attribute in pending[row]:
+            compatibility_scores[other_profile.user_id] += weighted_pair_score(
+                attribute, user_profile.get(attribute), other_profile.get(attribute), scores.get(attribute), weights[attribute])
+
+
+# Function to LLM-score candidate Profiles in packed blocks of block_size, the blocks running in parallel
+def score_candidates_packed(user_profile: profiles.Profile, candidates: list, weights: dict, block_size: int = MATCH_SCORE_BLOCK_SIZE) -> dict:
+    candidates = [candidate for candidate in candidates if candidate.user_id != user_profile.user_id]
+    blocks = [candidates[start:start + block_size] for start in range(0, len(candidates), block_size)]
+
+    compatibility_scores = {}
+    with ThreadPoolExecutor(max_workers=max(len(blocks), 1)) as executor:
+        for block_scores in executor.map(lambda block: score_candidate_block(user_profile, block, weights), blocks):
+            compatibility_scores.update(block_scores)
+    return compatibility_scores
 
-# Function to call OpenAI assistant with batch processing
-def call_openai_assistant_batch(json_schema, all_messages_batch):
+
+# Function to call OpenAI assistant with batch processing (BULK priority yields to interactive calls)
+def call_openai_assistant_batch(json_schema, all_messages_batch, priority: int = openaiClient.INTERACTIVE):
     try:
-        response = openai.chat.completions.create(
-            model="gpt-4o-mini",
+        response = openai_client.chat_completion(
+            priority=priority,
+            model=OPENAI_MODEL,
             messages=all_messages_batch,
             response_format={
                 "type": "json_schema",
@@ -26,9 +296,11 @@ def call_openai_assistant_batch(json_schema, all_messages_batch):
         print(f"Error during OpenAI call: {e}")
         return None
 
-# Function to fetch a single user profile from the database
+# Function to fetch a single user profile from the database (or the in-process profile store)
 def get_user_profile(user_id: str, tableProfile):
     try:
+        if isinstance(tableProfile, profileStore.ProfileStore):
+            return tableProfile.get(user_id)
         response = tableProfile.get_item(
             Key={'UserID': user_id}
         )
@@ -37,17 +309,97 @@ def get_user_profile(user_id: str, tableProfile):
         print(f"Error fetching user profile: {e}")
         return None
 
-# Function to fetch all user profiles from the database in a batch
+# Function to scan a plain profile table into a UserID -> parsed Profile map
+def load_profile_snapshot(tableProfile):
+    try:
+        return {item['UserID']: parse_profile(item) for item in dynamoScan.parallel_scan(tableProfile)}
+    except Exception as e:
+        print(f"Error fetching all user profiles: {e}")
+        return None
+
+table_snapshots = cache.LoadingCache(load_profile_snapshot, maxsize=8, ttl=MATCH_SNAPSHOT_TTL)
+
+# Function to get the UserID -> parsed Profile map shared by concurrent match runs (read-only)
+def get_profile_snapshot(tableProfile):
+    try:
+        if isinstance(tableProfile, profileStore.ProfileStore):
+            return tableProfile.snapshot()
+        return table_snapshots.get(tableProfile)
+    except Exception as e:
+        print(f"Error fetching all user profiles: {e}")
+        return None
+
+# Function to fetch all user profiles from the database (or the in-process profile store)
 def get_all_user_profiles(tableProfile):
     try:
-        response = tableProfile.scan()
-        return response["Items"]
+        if isinstance(tableProfile, profileStore.ProfileStore):
+            return tableProfile.all()
+
+        # Paged parallel scan, so the candidate pool is never truncated
+        return list(dynamoScan.parallel_scan(tableProfile))
     except Exception as e:
         print(f"Error fetching all user profiles: {e}")
         return None
 
-# Function to generate dynamic weights using OpenAI API
-def generate_dynamic_weights(user):
+# Function to parse a profile item into the compact Profile the indexes and scorers work on
+def parse_profile(user: dict) -> profiles.Profile:
+    return profiles.Profile.from_item(user)
+
+# Function to get a user's parsed Profile: the store's own, or parsed from a freshly fetched item
+def get_parsed_profile(user: dict, tableProfile) -> profiles.Profile:
+    if isinstance(tableProfile, profileStore.ProfileStore):
+        profile = tableProfile.profile(user['UserID'])
+        if profile is not None:
+            return profile
+    return parse_profile(user)
+
+# Function to keep the candidate index and feature matrix in line with the parsed profiles
+def sync_candidates(tableProfile, all_profiles):
+    global _attached_store
+
+    if not isinstance(tableProfile, profileStore.ProfileStore):
+        candidate_index.sync(all_profiles)
+        profile_matrix.sync(all_profiles)
+        embedding_index.sync(all_profiles)
+        return
+
+    # A profile store pushes every change to its listeners, so attach once
+    with _attach_lock:
+        if _attached_store is not tableProfile:
+            tableProfile.add_listener(candidate_index.add)
+            tableProfile.add_listener(profile_matrix.upsert)
+            tableProfile.add_listener(embedding_index.upsert)
+            _attached_store = tableProfile
+
+# Function to rank a user's candidates (given their parsed Profile) with the local scoring engine
+def rank_candidates(user_profile, weights, top_k: int, ann_top_k: int = MATCH_ANN_TOP_K):
+    # Narrow the pool to the most semantically similar profiles first, if enabled
+    similar = embedding_index.query(user_profile, ann_top_k) if ann_top_k else None
+
+    # Drop candidates that fail a hard constraint before any scoring happens
+    candidate_ids = None
+    if similar is not None:
+        candidate_ids = candidate_index.filter_ids(user_profile, [candidate_id for candidate_id, _ in similar])
+        print(f"{len(candidate_ids)} of {len(similar)} similar profiles pass the hard constraints")
+        # Profiles without free text have no embedding, so a short list falls back to the full filtered pool
+        if len(candidate_ids) < top_k:
+            print(f"Only {len(candidate_ids)} similar candidates for {top_k} slots; using every filtered profile")
+            candidate_ids = None
+    if candidate_ids is None:
+        candidate_ids = [candidate.user_id for candidate in candidate_index.filter_candidates(user_profile)]
+        print(f"{len(candidate_ids)} of {len(candidate_index)} profiles pass the hard constraints")
+
+    # Score the remaining candidates locally in one vectorised pass
+    return profile_matrix.top_k(user_profile, weights, top_k, candidate_ids)
+
+# Function to generate dynamic weights using OpenAI API (batch callers pass openaiClient.BULK)
+def generate_dynamic_weights(user, priority: int = openaiClient.INTERACTIVE):
+    # Reuse the weights generated for an identical profile
+    cached_weights = weights_cache.get(user)
+    if cached_weights is not None:
+        print(f"Using cached weights for user {user['UserID']}")
+        return cached_weights
+
     # Create a message to send to OpenAI API
     print(f"User profile: {user}")
     prompt = f"Generate weights for the following user attributes based on user preferences:\n" \
@@ -122,12 +474,13 @@ def generate_dynamic_weights(user):
     }
 
     # Call OpenAI API to get weights
-    response = call_openai_assistant_batch(json_schema, all_messages_batch)
+    response = call_openai_assistant_batch(json_schema, all_messages_batch, priority=priority)
     if response and len(response) > 0:
         try:
             # Parse the JSON response to get weights
             weights = json.loads(response[0])
             print(f"Generated weights: {weights}")
+            weights_cache.set(user, weights)
             return weights
         except (json.JSONDecodeError, IndexError):
             print("Error decoding weights response.")
@@ -182,93 +535,118 @@ def give_explanation(user_id: str, matched_id: str, tableProfile):
 
     # Complete the function
 
-# Optimized matchmaking function with batch API calls and parallel processing
-def run_matchmaking_algorithm(user_id: str, tableProfile: any):
-    # Matchmaking JSON schema
-    json_schema = {
-        "name": "matchmaking_score",
-        "strict": True,
-        "schema": {
-            "type": "object",
-            "properties": {
-                "compatibility_score": {"type": "integer"}
-            },
-            "required": ["compatibility_score"],
-            "additionalProperties": False
-        }
-    }
+# Matchmaking function: local vectorised scoring, with optional LLM reranking of the top-K
+@instrumentation.timed("run_matchmaking_algorithm")
+def run_matchmaking_algorithm(user_id: str, tableProfile: any, top_k: int = MATCH_TOP_K, llm_rerank: bool = MATCH_LLM_RERANK):
+    json_schema = MATCHMAKING_SCORE_SCHEMA
 
     all_messages = [{
         "role": "system",
-        "content": '''You're an expert matchmaker. You'll be given attributes from 2 different people's matchmaking profiles in JSON format, compare them and output a compatibility score (on a scale of 1 to 10).'''
+        "content": MATCHMAKING_SYSTEM_PROMPT
     }]
 
     # Fetch user profiles
     user = get_user_profile(user_id, tableProfile)
-    all_users = get_all_user_profiles(tableProfile)
+    snapshot = get_profile_snapshot(tableProfile)
 
-    if not user or not all_users:
+    if not user or not snapshot:
         return {"error": "Failed to fetch user profiles"}
 
     # Generate dynamic weights based on the user profile using OpenAI API
     weights = generate_dynamic_weights(user)
 
-    # Function to process each user in parallel
-    def process_other_user(other_user):
-        if other_user['UserID'] == user_id:
+    user_profile = get_parsed_profile(user, tableProfile)
+
+    # Function to process each candidate Profile in parallel, scoring the given attributes
+    def process_other_user(other_profile, weights=weights):
+        if other_profile.user_id == user_id:
             return None  # Skip self
 
         compatibility_score = 0
-        all_messages_batch = []
+        uncached_attributes = []
+        waiting = []
 
         for attribute, weight in weights.items():
             content_dict = {
-                "Person 1": user.get(attribute, "Not specified"),
-                "Person 2": other_user.get(attribute, "Not specified")
+                "Person 1": user_profile.get(attribute, "Not specified"),
+                "Person 2": other_profile.get(attribute, "Not specified")
             }
 
-            # Add comparison request to batch
-            all_messages_batch.append({
-                "role": "user",
-                "content": json.dumps(content_dict)
-            })
-
-        # Batch API call to OpenAI
-        assistant_responses = call_openai_assistant_batch(json_schema, all_messages_batch)
-
-        # Process responses for each attribute
-        for response, attribute in zip(assistant_responses, weights.keys()):
-            try:
-                attribute_score = json.loads(response)["compatibility_score"]
-                compatibility_score += attribute_score * weights[attribute]
-            except (json.JSONDecodeError, KeyError):
-                print(f"Error decoding response for attribute {attribute}")
+            # Reuse the score if this pair of values has been compared before
+            cached_score = pair_scores.get(attribute, content_dict["Person 1"], content_dict["Person 2"])
+            if cached_score is not None:
+                compatibility_score += cached_score * weight
                 continue
 
-        return other_user['UserID'], compatibility_score
-
-    # Run matchmaking in parallel
-    with ThreadPoolExecutor() as executor:
-        results = executor.map(process_other_user, all_users)
-
-    # Collect valid results
-    compatibility_scores = dict(filter(None, results))
+            # Wait for the score instead if another run is already comparing this pair
+            future = pair_scores.claim(attribute, content_dict["Person 1"], content_dict["Person 2"])
+            if future is not None:
+                waiting.append((other_profile.user_id, attribute, future))
+                continue
 
-    # Find the top match
-    if compatibility_scores:
-        top_match = max(compatibility_scores.items(), key=lambda x: x[1])
-    else:
-        top_match = None
+            uncached_attributes.append((attribute, content_dict))
 
-        print("Compatibility scores:")
-        for user_id, score in compatibility_scores.items():
-            print(f"User ID: {user_id}, Compatibility Score: {score}")
+        # Function to score one attribute comparison; a completion only returns one score
+        def score_attribute(content_dict):
+            messages = all_messages + [{
+                "role": "user",
+                "content": json.dumps(content_dict)
+            }]
+            assistant_responses = call_openai_assistant_batch(json_schema, messages, priority=openaiClient.INTERACTIVE)
+            try:
+                return valid_score(json.loads(assistant_responses[0])["compatibility_score"])
+            except (IndexError, TypeError, json.JSONDecodeError, KeyError):
+                return None
 
-        print(f"Top match: {top_match}")
+        if uncached_attributes:
+            try:
+                # One request per attribute, sent in parallel
+                with ThreadPoolExecutor(max_workers=len(uncached_attributes)) as executor:
+                    attribute_scores = list(executor.map(lambda uncached: score_attribute(uncached[1]), uncached_attributes))
+
+                for (attribute, content_dict), attribute_score in zip(uncached_attributes, attribute_scores):
+                    if attribute_score is None:
+                        print(f"Error decoding response for attribute {attribute}")
+                    compatibility_score += weighted_pair_score(
+                        attribute, content_dict["Person 1"], content_dict["Person 2"], attribute_score, weights[attribute])
+            finally:
+                for attribute, content_dict in uncached_attributes:
+                    pair_scores.release(attribute, content_dict["Person 1"], content_dict["Person 2"])
+
+        shared_scores = {other_profile.user_id: compatibility_score}
+        wait_for_shared_scores(waiting, weights, shared_scores)
+        return other_profile.user_id, shared_scores[other_profile.user_id]
+
+    sync_candidates(tableProfile, snapshot.values())
+    shortlist = rank_candidates(user_profile, weights, max(top_k, MATCH_RERANK_POOL) if llm_rerank else top_k)
+    top_matches = shortlist[:top_k]
+
+    # Rerank the shortlisted candidates with the LLM, dropping those that can no longer make the top K
+    if llm_rerank and shortlist and weights:
+        candidate_ids = [candidate_id for candidate_id, _ in shortlist if candidate_id in snapshot]
+
+        def score_stage(stage_weights, candidate_ids):
+            stage_profiles = [snapshot[candidate_id] for candidate_id in candidate_ids]
+            if MATCH_PACKED_SCORING:
+                return score_candidates_packed(user_profile, stage_profiles, stage_weights)
+            with ThreadPoolExecutor() as executor:
+                results = executor.map(lambda other_profile: process_other_user(other_profile, stage_weights), stage_profiles)
+            return dict(filter(None, results))
+
+        top_matches = scoring.bounded_top_k(candidate_ids, weights, score_stage, top_k, MATCH_BOUND_STAGES)
+        print(f"Pairwise score cache: {pair_scores.stats()}")
+
+    compatibility_scores = dict(top_matches)
+    top_match = top_matches[0] if top_matches else None
+
+    print("Top matches:")
+    for rank, (match_id, score) in enumerate(top_matches, start=1):
+        print(f"{rank}. User ID: {match_id}, Compatibility Score: {score}")
 
     return {
         "user": user,
         "compatibility_scores": compatibility_scores,
+        "top_matches": top_matches,
         "top_match": top_match
     }
 
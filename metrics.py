@@ -1,14 +1,21 @@
+import heapq
+import json
+import os
+import threading
+import time
+from collections import Counter
+
 import boto3
-from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.conditions import Attr
+import dynamoScan
 
 AWS_REGION = "us-east-1"  # Replace with your preferred AWS region
 dynamodb = boto3.resource('dynamodb', region_name=AWS_REGION)
 tableChat = dynamodb.Table('ChatMessages')
 tableProfile = dynamodb.Table('UserProfiles')
 
-# Assuming you've already set up your DynamoDB resource
-dynamodb = boto3.resource('dynamodb')
-tableChat = dynamodb.Table('YourChatTableName')  # Replace with your actual table name
+HOUR_MS = dynamoScan.HOUR_MS
+
 
 def get_all_messages():
     """
@@ -18,19 +25,234 @@ def get_all_messages():
     - A list of all messages or an empty list if none are found.
     """
     try:
-        # Using scan to fetch all items from the table
-        response = tableChat.scan()
-        
-        messages = response.get('Items', [])
-        
-        # Continue scanning until all messages are retrieved
-        while 'LastEvaluatedKey' in response:
-            response = tableChat.scan(ExclusiveStartKey=response['LastEvaluatedKey'])
-            messages.extend(response.get('Items', []))
-
-        print(f"Fetched messages: {messages}")
+        # Parallel segmented scan over the whole table
+        messages = list(dynamoScan.parallel_scan(tableChat))
+        print(f"Fetched {len(messages)} messages")
         return messages
-    
+
     except Exception as e:
         print(f"Error fetching messages from DynamoDB: {e}")
-        return []
\ No newline at end of file
+        return []
+
+
+class MessageMetrics:
+    """
+    Running message counters: total, per chat, per sender role and per hour.
+
+    Messages stored by this process are counted on write, so by default no
+    read touches DynamoDB. To also count messages written by other
+    processes, store each message with an HourBucket attribute and give
+    index_name: a GSI keyed on HourBucket with Timestamp as the sort key.
+    Every refresh_interval seconds the hour buckets since the Timestamp
+    high-water mark (minus `lag` seconds, for writes that land late) are
+    queried, and keys already counted are skipped. Counters and the
+    high-water mark are checkpointed to checkpoint_path, so a restart
+    picks up where it left off.
+
+    Without a checkpoint, the total starts from one Select=COUNT scan of the
+    table at start-up (only up to the backfill window when an index is
+    given), so `length` is the table's message count rather than this
+    process's.
+    """
+
+    def __init__(self, table, admin_id: str = None, checkpoint_path: str = None, index_name: str = None,
+                 refresh_interval: float = 0, lag: float = 60, hours: int = 168, top_chats: int = 10):
+        self.table = table
+        self.admin_id = admin_id
+        self.checkpoint_path = checkpoint_path
+        self.index_name = index_name
+        self.refresh_interval = refresh_interval
+        self.lag_ms = int(lag * 1000)
+        self.hours = hours
+        self.top_chats = top_chats
+        self.total = 0
+        self.per_chat = Counter()
+        self.per_role = Counter()
+        self.per_hour = Counter()
+        self.high_water = 0
+        self.refreshed_at = None
+        self._busiest = {}
+        self._seen = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._refresher = None
+
+    @property
+    def refreshing(self) -> bool:
+        return bool(self.refresh_interval and self.index_name)
+
+    def _role(self, sender_user_id) -> str:
+        return "assistant" if sender_user_id == self.admin_id else "user"
+
+    def _rank(self, chat_id: str, count: int):
+        # Counts only grow, so a chat joins the top N exactly when it passes the smallest one there
+        if chat_id in self._busiest or len(self._busiest) < self.top_chats:
+            self._busiest[chat_id] = count
+            return
+        smallest = min(self._busiest, key=self._busiest.get)
+        if count > self._busiest[smallest]:
+            del self._busiest[smallest]
+            self._busiest[chat_id] = count
+
+    def _count(self, item: dict, remember: bool = True):
+        key = (item['ChatID'], int(item['Timestamp']))
+        if key in self._seen:
+            return
+        if remember:
+            self._seen[key] = True
+
+        self.total += 1
+        self.per_chat[item['ChatID']] += 1
+        self._rank(item['ChatID'], self.per_chat[item['ChatID']])
+        self.per_role[self._role(item.get('SenderUserID'))] += 1
+        self.per_hour[key[1] // HOUR_MS] += 1
+
+    def _prune(self):
+        cutoff = self.high_water - self.lag_ms
+        self._seen = {key: True for key in self._seen if key[1] > cutoff}
+        oldest_hour = int(time.time() * 1000) // HOUR_MS - self.hours
+        for hour in [hour for hour in self.per_hour if hour <= oldest_hour]:
+            del self.per_hour[hour]
+
+    # Function to count a message as it is stored
+    def record(self, item: dict):
+        with self._lock:
+            # Without refreshes no later query can see this key again
+            self._count(item, remember=self.refreshing)
+
+    # Function to start the total from the messages already in the table, when there is no checkpoint
+    def seed(self) -> int:
+        """
+        Count the table once with a Select=COUNT scan and add it to the total.
+
+        With an index, only messages up to the backfill window are counted;
+        the first refresh queries the rest.
+
+        Returns:
+        - The cutoff Timestamp the first refresh should start from, or 0.
+        """
+        cutoff = 0
+        if self.refreshing:
+            cutoff = int(time.time() * 1000) - self.hours * HOUR_MS
+            count = dynamoScan.parallel_count(self.table, FilterExpression=Attr('Timestamp').lte(cutoff))
+        else:
+            count = dynamoScan.parallel_count(self.table)
+
+        with self._lock:
+            self.total += count
+        print(f"Seeded message metrics with {count} stored messages")
+        self.save()
+        return cutoff
+
+    # Function to count the messages other processes wrote since the last refresh
+    def refresh(self, since: int = None):
+        if since is None:
+            now = int(time.time() * 1000)
+            # Without a checkpoint, backfill the hours kept in per_hour rather than the whole table
+            since = max(self.high_water - self.lag_ms, now - self.hours * HOUR_MS)
+
+        before = self.total
+        items = dynamoScan.query_since(self.table, self.index_name, 'Timestamp', since,
+                                       projection=['ChatID', 'Timestamp', 'SenderUserID'])
+        for item in items:
+            with self._lock:
+                self._count(item)
+                self.high_water = max(self.high_water, int(item['Timestamp']))
+
+        with self._lock:
+            # Keys at or below the high-water mark minus lag can't come back in a later query
+            self._prune()
+            self.refreshed_at = time.time()
+            counted = self.total - before
+
+        if counted:
+            print(f"Counted {counted} new messages in message metrics")
+        self.save()
+
+    def load(self) -> bool:
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return False
+        with open(self.checkpoint_path) as f:
+            state = json.load(f)
+
+        with self._lock:
+            self.total = state["total"]
+            self.per_chat = Counter(state["per_chat"])
+            self.per_role = Counter(state["per_role"])
+            self.per_hour = Counter({int(hour): count for hour, count in state["per_hour"].items()})
+            self.high_water = state["high_water"]
+            self._seen = {(chat_id, timestamp): True for chat_id, timestamp in state["seen"]}
+            self._busiest = dict(heapq.nlargest(self.top_chats, self.per_chat.items(), key=lambda entry: entry[1]))
+        return True
+
+    def save(self):
+        if not self.checkpoint_path:
+            return
+        with self._lock:
+            state = {
+                "total": self.total,
+                "per_chat": dict(self.per_chat),
+                "per_role": dict(self.per_role),
+                "per_hour": {str(hour): count for hour, count in self.per_hour.items()},
+                "high_water": self.high_water,
+                "seen": list(self._seen)
+            }
+        with open(f"{self.checkpoint_path}.tmp", "w") as f:
+            json.dump(state, f)
+        os.replace(f"{self.checkpoint_path}.tmp", self.checkpoint_path)
+
+    def snapshot(self) -> dict:
+        """
+        Current aggregates, read from the counters without touching DynamoDB.
+        """
+        current_hour = int(time.time() * 1000) // HOUR_MS
+        with self._lock:
+            return {
+                "length": self.total,
+                "chats": len(self.per_chat),
+                "by_role": dict(self.per_role),
+                "last_hour": self.per_hour.get(current_hour, 0),
+                "last_24_hours": sum(self.per_hour.get(current_hour - hour, 0) for hour in range(24)),
+                "busiest_chats": sorted(self._busiest.items(), key=lambda entry: entry[1], reverse=True),
+                "refreshed_at": self.refreshed_at
+            }
+
+    def _refresh_loop(self, seed: bool):
+        since = None
+        if seed:
+            try:
+                since = self.seed() or None
+            except Exception as e:
+                print(f"Error seeding message metrics: {e}")
+        while self.refreshing:
+            try:
+                self.refresh(since)
+            except Exception as e:
+                print(f"Error refreshing message metrics: {e}")
+            since = None
+            if self._stop.wait(self.refresh_interval):
+                return
+
+    # Function to restore the checkpoint (or seed the total) and, with an index configured, start counting other writers
+    def start(self):
+        loaded = False
+        try:
+            loaded = self.load()
+        except Exception as e:
+            print(f"Error loading message metrics checkpoint: {e}")
+
+        if self.refresh_interval and not self.index_name:
+            print("Message metrics refresh needs an HourBucket index; counting this process's writes only")
+        if (self.refreshing or not loaded) and self._refresher is None:
+            self._stop.clear()
+            # The one-off seed count runs off the request path too
+            self._refresher = threading.Thread(target=self._refresh_loop, args=(not loaded,), daemon=True)
+            self._refresher.start()
+
+    def stop(self):
+        self._stop.set()
+        self._refresher = None
+        try:
+            self.save()
+        except Exception as e:
+            print(f"Error saving message metrics checkpoint: {e}")
@@ -0,0 +1,204 @@
+import heapq
+import itertools
+import json
+import random
+import threading
+import time
+
+import instrumentation
+
+# Caller priorities: lower is admitted first
+INTERACTIVE = 0
+BULK = 1
+
+_PRIORITY_NAMES = {INTERACTIVE: "interactive", BULK: "bulk"}
+
+# Completion tokens assumed when a call doesn't set max_tokens
+DEFAULT_COMPLETION_TOKENS = 256
+
+queue_wait_seconds = instrumentation.REGISTRY.register(instrumentation.Histogram(
+    "openai_queue_wait_seconds", "Time OpenAI calls spent waiting for a concurrency slot and rate budget.", ["priority"]))
+throttled = instrumentation.REGISTRY.register(instrumentation.Counter(
+    "openai_throttled_total", "OpenAI calls delayed by the local rate limits or rejected by the API.", ["reason"]))
+retries = instrumentation.REGISTRY.register(instrumentation.Counter(
+    "openai_retries_total", "OpenAI calls retried after a 429, 5xx or connection error.", ["priority"]))
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled at `per_minute` tokens per minute.
+
+    reserve() always succeeds and returns how long the caller must wait
+    before using what it reserved, so the bucket can go into debt.
+    """
+
+    def __init__(self, per_minute: float, capacity: float = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+    # Function to correct a reservation once the real usage is known (negative refunds)
+    def adjust(self, amount: float):
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens - amount)
+
+
+def _status_code(error):
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status
+
+
+def _retry_after(error):
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def estimate_tokens(kwargs: dict) -> int:
+    # About four characters per token, plus the completion budget
+    prompt = sum(len(json.dumps(message.get("content", ""))) for message in kwargs.get("messages", []))
+    return prompt // 4 + (kwargs.get("max_tokens") or DEFAULT_COMPLETION_TOKENS)
+
+
+class GovernedOpenAIClient:
+    """
+    Shared gate in front of chat.completions.create.
+
+    - Requests- and tokens-per-minute token buckets keep bursts under quota.
+    - Concurrency is limited adaptively (AIMD): +1 per successful window,
+      halved on a 429, between min_concurrency and max_concurrency.
+    - 429, 5xx and connection errors are retried with jittered exponential
+      backoff, honouring Retry-After.
+    - Waiting callers are admitted by priority, so INTERACTIVE calls go
+      ahead of BULK scoring.
+
+    `create` is the function that actually makes the call.
+    """
+
+    def __init__(self, create, rpm: float = 500, tpm: float = 200000, max_concurrency: int = 16,
+                 min_concurrency: int = 1, max_retries: int = 5, base_delay: float = 0.5, max_delay: float = 30.0):
+        self.create = create
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.limit = float(max_concurrency)
+        self._in_flight = 0
+        self._waiting = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+
+    def _acquire(self, priority: int):
+        entry = (priority, next(self._sequence))
+        with self._condition:
+            heapq.heappush(self._waiting, entry)
+            while self._waiting[0] != entry or self._in_flight >= int(self.limit):
+                self._condition.wait()
+            heapq.heappop(self._waiting)
+            self._in_flight += 1
+            # The next waiter may fit under the limit too
+            self._condition.notify_all()
+
+    def _release(self):
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def _on_success(self):
+        with self._condition:
+            self.limit = min(self.max_concurrency, self.limit + 1.0 / max(self.limit, 1.0))
+            self._condition.notify_all()
+
+    def _on_throttled(self):
+        with self._condition:
+            self.limit = max(self.min_concurrency, self.limit / 2)
+
+    def _backoff(self, attempt: int, error) -> float:
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        retry_after = _retry_after(error)
+        return max(delay, retry_after) if retry_after is not None else delay
+
+    def _is_retryable(self, error) -> bool:
+        status = _status_code(error)
+        if status is not None:
+            return status == 429 or status >= 500
+        # No HTTP status: connection errors and timeouts
+        return type(error).__name__ in ("APIConnectionError", "APITimeoutError", "ConnectError", "TimeoutException")
+
+    def chat_completion(self, priority: int = INTERACTIVE, **kwargs):
+        """
+        Make a chat.completions.create call through the gate.
+
+        Raises the last error once retries are exhausted or the error isn't retryable.
+        """
+        priority_name = _PRIORITY_NAMES.get(priority, str(priority))
+        estimate = estimate_tokens(kwargs)
+
+        for attempt in range(self.max_retries + 1):
+            queued = time.perf_counter()
+            self._acquire(priority)
+            try:
+                wait = max(self.requests.reserve(1), self.tokens.reserve(estimate))
+                if wait > 0:
+                    throttled.inc("local_rate_limit")
+                    time.sleep(wait)
+                queue_wait_seconds.observe(time.perf_counter() - queued, priority_name)
+
+                try:
+                    with instrumentation.track("openai", "chat.completions"):
+                        response = self.create(**kwargs)
+                except Exception as e:
+                    # A rejected call still used its request; refund the token estimate
+                    self.tokens.adjust(-estimate)
+                    if not self._is_retryable(e) or attempt == self.max_retries:
+                        raise
+                    status = _status_code(e)
+                    if status == 429:
+                        throttled.inc("429")
+                        self._on_throttled()
+                    else:
+                        throttled.inc("5xx" if status else "connection")
+                    error = e
+                    delay = self._backoff(attempt, e)
+                else:
+                    usage = getattr(response, "usage", None)
+                    total_tokens = getattr(usage, "total_tokens", None)
+                    if total_tokens is not None:
+                        self.tokens.adjust(total_tokens - estimate)
+                    self._on_success()
+                    return response
+            finally:
+                self._release()
+
+            retries.inc(priority_name)
+            print(f"OpenAI call failed ({error}); retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+    def stats(self) -> dict:
+        with self._condition:
+            return {
+                "concurrency_limit": self.limit,
+                "in_flight": self._in_flight,
+                "waiting": len(self._waiting)
+            }
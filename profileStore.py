@@ -0,0 +1,176 @@
+import threading
+import time
+from boto3.dynamodb.conditions import Attr
+import dynamoScan
+import profiles
+
+
+class ProfileStore:
+    """
+    In-process copy of the UserProfiles table.
+
+    The table is loaded once (with a paged parallel scan so nothing is
+    truncated) and then kept current by write-through from
+    store_user_profile_in_dynamodb. An optional background refresh picks up
+    profiles written by other processes using their UpdatedAt timestamp,
+    going back `lag` extra seconds for clock skew between writers.
+
+    Give index_name (a GSI keyed on HourBucket with UpdatedAt as the sort
+    key, with profiles written with an HourBucket attribute) so a refresh
+    only queries the hours since the last one. Without it every refresh is
+    a filtered Scan, which reads (and is billed for) the whole table.
+
+    Items are kept with their strings interned, so profiles sharing an
+    answer share one string. Each item is also parsed once, when it is
+    loaded or changes, into a profiles.Profile; listeners, profile() and
+    snapshot() hand out those parsed profiles.
+    """
+
+    def __init__(self, table, refresh_interval: float = 0, index_name: str = None, lag: float = 60):
+        self.table = table
+        self.refresh_interval = refresh_interval
+        self.index_name = index_name
+        self.lag_ms = int(lag * 1000)
+        self._profiles = {}
+        self._parsed = {}
+        self._version = 0
+        self._snapshot = None
+        self._listeners = []
+        self._loaded = False
+        self._last_refresh = 0
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._refresher = None
+
+    def __len__(self):
+        self._ensure_loaded()
+        return len(self._profiles)
+
+    # Function to register a callback invoked with every inserted or updated parsed profile
+    def add_listener(self, listener):
+        with self._lock:
+            self._listeners.append(listener)
+            for profile in self._parsed.values():
+                listener(profile)
+
+    def _scan(self, **scan_kwargs):
+        return dynamoScan.parallel_scan(self.table, **scan_kwargs)
+
+    def _apply(self, item: dict):
+        with self._lock:
+            current = self._profiles.get(item['UserID'])
+            # Every profile write stamps a fresh UpdatedAt; only a changed UserProfile is a change
+            if current is not None and current.get('UserProfile') == item.get('UserProfile'):
+                return False
+            self._profiles[item['UserID']] = profiles.intern_item(item)
+            profile = self._parsed[item['UserID']] = profiles.Profile.from_item(item)
+            self._version += 1
+            for listener in self._listeners:
+                listener(profile)
+            return True
+
+    # Function to load the whole table, page by page
+    def load(self):
+        started = int(time.time() * 1000)
+        items = {item['UserID']: profiles.intern_item(item) for item in self._scan()}
+        parsed = {user_id: profiles.Profile.from_item(item) for user_id, item in items.items()}
+
+        with self._lock:
+            self._profiles = items
+            self._parsed = parsed
+            self._version += 1
+            self._loaded = True
+            self._last_refresh = started
+            for listener in self._listeners:
+                for profile in parsed.values():
+                    listener(profile)
+
+        print(f"Loaded {len(items)} user profiles into the profile store")
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self.load()
+
+    # Function to pull in profiles changed since the last refresh
+    def refresh(self):
+        self._ensure_loaded()
+        started = int(time.time() * 1000)
+        since = max(self._last_refresh - self.lag_ms, 0)
+        if self.index_name:
+            items = dynamoScan.query_since(self.table, self.index_name, 'UpdatedAt', since)
+        else:
+            items = self._scan(FilterExpression=Attr('UpdatedAt').gte(since))
+
+        updated = 0
+        for item in items:
+            # The lag window re-reads recent items; only count the ones that changed
+            updated += self._apply(item)
+
+        self._last_refresh = started
+        if updated:
+            print(f"Refreshed {updated} user profiles in the profile store")
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Error refreshing profile store: {e}")
+
+    # Function to load the store and start the periodic delta refresh, if configured
+    def start(self):
+        try:
+            self._ensure_loaded()
+        except Exception as e:
+            print(f"Error loading profile store: {e}")
+
+        if self.refresh_interval and self._refresher is None:
+            self._stop.clear()
+            self._refresher = threading.Thread(target=self._refresh_loop, daemon=True)
+            self._refresher.start()
+
+    def stop(self):
+        self._stop.set()
+        self._refresher = None
+
+    # Function to record a profile item that was just written to the table
+    def put(self, item: dict):
+        if self._loaded:
+            self._apply(item)
+
+    def get(self, user_id: str):
+        self._ensure_loaded()
+        item = self._profiles.get(user_id)
+        if item is None:
+            # Written by another process since the last refresh
+            item = self.table.get_item(Key={'UserID': user_id}).get('Item')
+            if item:
+                self._apply(item)
+        return item
+
+    def profile(self, user_id: str):
+        """
+        Parsed form of get(user_id), or None if there is no such profile.
+        """
+        if self.get(user_id) is None:
+            return None
+        return self._parsed.get(user_id)
+
+    def all(self) -> list:
+        self._ensure_loaded()
+        with self._lock:
+            return list(self._profiles.values())
+
+    def snapshot(self) -> dict:
+        """
+        UserID -> parsed profile map shared by concurrent readers, rebuilt only after a change.
+
+        Callers must treat it as read-only.
+        """
+        self._ensure_loaded()
+        with self._lock:
+            if self._snapshot is None or self._snapshot[0] != self._version:
+                self._snapshot = (self._version, dict(self._parsed))
+            return self._snapshot[1]
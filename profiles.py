@@ -0,0 +1,149 @@
+import math
+import sys
+
+import numpy as np
+
+import candidateIndex
+import scoring
+
+# Structured fields stored as candidateIndex.VOCABULARIES codes, and how each is classified
+CATEGORICAL_FIELDS = {
+    "kids": candidateIndex.classify_kids,
+    "smoking": candidateIndex.classify_smoking,
+    "pets": candidateIndex.classify_pets,
+    "location": candidateIndex.normalize_location,
+    "willingness_to_travel": candidateIndex.classify_travel
+}
+
+_ATTRIBUTE_INDEX = {attribute: index for index, attribute in enumerate(scoring.ATTRIBUTES)}
+
+
+def normalize_text(value):
+    """
+    Collapse whitespace in a free-text answer and intern it, so identical answers share one string.
+
+    Returns None for missing or blank values.
+    """
+    if value is None:
+        return None
+    text = " ".join(str(value).split())
+    return sys.intern(text) if text else None
+
+
+# Function to intern the string values of a raw profile item in place
+def intern_item(item: dict) -> dict:
+    user_profile = item.get('UserProfile')
+    if isinstance(user_profile, dict):
+        for attribute, value in user_profile.items():
+            if isinstance(value, str):
+                user_profile[attribute] = sys.intern(value)
+    return item
+
+
+class Profile:
+    """
+    Compact, parsed form of a UserProfiles item.
+
+    Age, preferred ages and income are numbers (None when unreadable), the
+    dealbreaker fields and gender are candidateIndex.VOCABULARIES codes,
+    seeks is a candidateIndex.seeks_mask and every scored attribute's text is
+    normalised and interned. All of them are parsed from the texts, once,
+    by from_item; read attributes with get(), as with the UserProfile dict.
+    """
+
+    __slots__ = ("user_id", "updated_at", "age", "min_age", "max_age", "annual_income",
+                 "kids", "smoking", "pets", "location", "willingness_to_travel", "gender", "seeks", "texts")
+
+    def __init__(self, user_id: str, updated_at: int = 0, age=None, min_age=None, max_age=None, annual_income=None,
+                 kids: int = 0, smoking: int = 0, pets: int = 0, location: int = 0, willingness_to_travel: int = 0,
+                 gender: int = 0, seeks: int = 0, texts: tuple = None):
+        self.user_id = user_id
+        self.updated_at = updated_at
+        self.age = age
+        self.min_age = min_age
+        self.max_age = max_age
+        self.annual_income = annual_income
+        self.kids = kids
+        self.smoking = smoking
+        self.pets = pets
+        self.location = location
+        self.willingness_to_travel = willingness_to_travel
+        self.gender = gender
+        self.seeks = seeks
+        self.texts = texts if texts is not None else (None,) * len(scoring.ATTRIBUTES)
+
+    @classmethod
+    def from_item(cls, item: dict):
+        user_profile = item.get('UserProfile') or {}
+        texts = tuple(normalize_text(user_profile.get(attribute)) for attribute in scoring.ATTRIBUTES)
+        text = dict(zip(scoring.ATTRIBUTES, texts))
+
+        age, preferred_ages = candidateIndex.parse_age(text['age'])
+        income = scoring.parse_number(text['annual_income'])
+        gender, seeks = candidateIndex.parse_identity(text['identity_and_preference'])
+        codes = {field: candidateIndex.VOCABULARIES[field].code(classify(text[field]))
+                 for field, classify in CATEGORICAL_FIELDS.items()}
+
+        return cls(
+            item['UserID'],
+            updated_at=int(item.get('UpdatedAt') or 0),
+            age=age,
+            min_age=preferred_ages[0] if preferred_ages else None,
+            max_age=preferred_ages[1] if preferred_ages else None,
+            annual_income=None if math.isnan(income) else income,
+            gender=candidateIndex.VOCABULARIES["gender"].code(gender),
+            seeks=candidateIndex.seeks_mask(seeks),
+            texts=texts,
+            **codes
+        )
+
+    def __repr__(self):
+        return f"Profile({self.user_id!r})"
+
+    def get(self, attribute: str, default=None):
+        index = _ATTRIBUTE_INDEX.get(attribute)
+        text = self.texts[index] if index is not None else None
+        return default if text is None else text
+
+    def category(self, field: str) -> str:
+        return candidateIndex.VOCABULARIES[field].value(getattr(self, field))
+
+    # Function to return the scored attributes that have a value, as a plain dict
+    def attributes(self) -> dict:
+        return {attribute: text for attribute, text in zip(scoring.ATTRIBUTES, self.texts) if text is not None}
+
+
+class ProfileBatch:
+    """
+    Column-oriented view over a list of Profiles for vectorised scoring.
+
+    Numbers are float32 arrays with NaN for unknown values, categorical
+    fields are int32 code arrays and text columns are lists aligned with
+    user_ids.
+    """
+
+    def __init__(self, profiles: list):
+        self.profiles = list(profiles)
+        self.user_ids = [profile.user_id for profile in self.profiles]
+        self.index = {user_id: row for row, user_id in enumerate(self.user_ids)}
+        self.age = self._numbers("age")
+        self.min_age = self._numbers("min_age")
+        self.max_age = self._numbers("max_age")
+        self.annual_income = self._numbers("annual_income")
+        self.codes = {field: np.fromiter((getattr(profile, field) for profile in self.profiles), dtype=np.int32,
+                                         count=len(self.profiles))
+                      for field in list(CATEGORICAL_FIELDS) + ["gender", "seeks"]}
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def _numbers(self, name: str) -> np.ndarray:
+        values = (getattr(profile, name) for profile in self.profiles)
+        return np.fromiter((np.nan if value is None else value for value in values), dtype=np.float32,
+                           count=len(self.profiles))
+
+    def texts(self, attribute: str) -> list:
+        index = _ATTRIBUTE_INDEX.get(attribute)
+        if index is None:
+            return [None] * len(self.profiles)
+        return [profile.texts[index] for profile in self.profiles]
@@ -0,0 +1,163 @@
+import threading
+import time
+from decimal import Decimal
+
+import matchMakingAlgorithm
+import openaiClient
+
+
+class RecommendationTable:
+    """
+    Precomputed top-N candidates for every user.
+
+    A full batch refresh ranks every user with the matchmaking scoring path.
+    Profile changes only mark the profile dirty. The background thread then
+    recomputes that user's row and touches only the other rows the changed
+    profile can enter or leave. Rows are kept in memory and, if a table is
+    given, written to DynamoDB so every worker can serve them.
+    """
+
+    def __init__(self, profile_store, top_n: int = 20, table=None, refresh_interval: float = 0, poll_interval: float = 5):
+        self.profile_store = profile_store
+        self.top_n = top_n
+        self.table = table
+        self.refresh_interval = refresh_interval
+        self.poll_interval = poll_interval
+        self._rows = {}
+        self._weights = {}
+        self._dirty = set()
+        self._last_full_refresh = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _compute_row(self, user: dict, weights: dict = None) -> list:
+        if weights is None:
+            # Cached weights are reused; anything new queues behind live match requests
+            weights = matchMakingAlgorithm.generate_dynamic_weights(user, priority=openaiClient.BULK)
+            with self._lock:
+                self._weights[user['UserID']] = weights
+        return matchMakingAlgorithm.rank_candidates(self.profile_store.profile(user['UserID']), weights, self.top_n)
+
+    def _store_row(self, user_id: str, row: list):
+        with self._lock:
+            self._rows[user_id] = row
+
+        if self.table is not None:
+            try:
+                self.table.put_item(Item={
+                    'UserID': user_id,
+                    'Candidates': [{'UserID': candidate_id, 'Score': Decimal(str(round(score, 4)))}
+                                   for candidate_id, score in row],
+                    'UpdatedAt': int(time.time() * 1000)
+                })
+            except Exception as e:
+                print(f"Error storing recommendations for {user_id}: {e}")
+
+    # Function to recompute every user's row in one batch
+    def refresh_all(self):
+        all_users = self.profile_store.all()
+        matchMakingAlgorithm.sync_candidates(self.profile_store, self.profile_store.snapshot().values())
+
+        started = time.time()
+        for user in all_users:
+            self._store_row(user['UserID'], self._compute_row(user))
+
+        with self._lock:
+            self._last_full_refresh = time.time()
+        print(f"Refreshed recommendations for {len(all_users)} users in {time.time() - started:.1f}s")
+
+    # Profile store listener: queue changed profiles for an incremental update
+    def mark_dirty(self, profile):
+        with self._lock:
+            # Until the first batch refresh has run, it will cover every profile anyway
+            if self._last_full_refresh:
+                self._dirty.add(profile.user_id)
+
+    # Function to recompute only the rows affected by one changed profile
+    def refresh_user(self, user_id: str):
+        user = self.profile_store.get(user_id)
+        if not user:
+            return
+
+        self._store_row(user_id, self._compute_row(user))
+
+        with self._lock:
+            rows = dict(self._rows)
+            weights = dict(self._weights)
+
+        reverse_scores = matchMakingAlgorithm.profile_matrix.reverse_scores(self.profile_store.profile(user_id), weights)
+        updated = 0
+        for other_id, row in rows.items():
+            if other_id == user_id or other_id not in weights:
+                continue
+
+            other = self.profile_store.get(other_id)
+            if not other:
+                continue
+
+            # The changed profile may have dropped out of this row: rank it again with the known weights
+            if any(candidate_id == user_id for candidate_id, _ in row):
+                self._store_row(other_id, self._compute_row(other, weights[other_id]))
+                updated += 1
+                continue
+
+            # Otherwise it only matters if it now beats the row's weakest entry
+            score = reverse_scores.get(other_id)
+            threshold = row[-1][1] if len(row) >= self.top_n else float("-inf")
+            if score is not None and score > threshold and matchMakingAlgorithm.candidate_index.allows(self.profile_store.profile(other_id), user_id):
+                row = sorted(row + [(user_id, score)], key=lambda entry: entry[1], reverse=True)[:self.top_n]
+                self._store_row(other_id, row)
+                updated += 1
+
+        print(f"Updated recommendations for {user_id} and {updated} affected users")
+
+    def _process_dirty(self):
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+        for user_id in dirty:
+            self.refresh_user(user_id)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if time.time() - self._last_full_refresh >= self.refresh_interval:
+                    self.refresh_all()
+                else:
+                    self._process_dirty()
+            except Exception as e:
+                print(f"Error refreshing recommendations: {e}")
+            self._stop.wait(self.poll_interval)
+
+    # Function to start the batch refresh thread, if a refresh interval is configured
+    def start(self):
+        if not self.refresh_interval or self._thread is not None:
+            return
+        self.profile_store.add_listener(self.mark_dirty)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread = None
+
+    def lookup(self, user_id: str):
+        """
+        Fetch a user's precomputed recommendations.
+
+        Returns:
+        - A list of (UserID, score) tuples, best first, or None if no row exists yet.
+        """
+        with self._lock:
+            row = self._rows.get(user_id)
+        if row is not None or self.table is None:
+            return row
+
+        try:
+            item = self.table.get_item(Key={'UserID': user_id}).get('Item')
+            if item:
+                return [(candidate['UserID'], float(candidate['Score'])) for candidate in item['Candidates']]
+        except Exception as e:
+            print(f"Error fetching recommendations for {user_id}: {e}")
+        return None
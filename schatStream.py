@@ -0,0 +1,131 @@
+import asyncio
+import json
+import re
+import time
+from typing import Optional
+
+import httpx
+
+import instrumentation
+
+# End of a chunk: sentence punctuation, closing quotes/brackets and any trailing emoji, then
+# whitespace; or a line break
+_SENTENCE_END_RE = re.compile(r"[.!?…]+[\"'”’)\]]*(?:[ \t]*[^\w\s]+)*\s+|\n+")
+
+
+class SentenceSplitter:
+    """
+    Splits streamed text into complete sentences as it arrives.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+
+    def feed(self, text: str) -> list:
+        self._buffer += text
+        sentences = []
+        start = 0
+        for match in _SENTENCE_END_RE.finditer(self._buffer):
+            sentence = self._buffer[start:match.end()].strip()
+            if sentence:
+                sentences.append(sentence)
+            start = match.end()
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    # Function to return whatever is left once the stream ends
+    def flush(self) -> list:
+        sentence, self._buffer = self._buffer.strip(), ""
+        return [sentence] if sentence else []
+
+
+class SchatStreamClient:
+    """
+    Streaming client for the schat service.
+
+    POSTs the same payload as /chat/ to a streaming path that answers with
+    newline-delimited JSON: {"delta": "..."} lines as the reply is generated,
+    then one final {"assistant_response": ..., "user_profile": ...} line.
+    """
+
+    def __init__(self, base_url: str, path: str = "/chat/stream", timeout: float = 60.0):
+        # SCHAT_URL has historically been a bare host:port
+        self.base_url = base_url if base_url and "://" in base_url else f"http://{base_url}"
+        self.path = path
+        self.timeout = timeout
+        self._client = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # Created lazily so the pool belongs to the running event loop
+        if self._client is None:
+            self._client = httpx.AsyncClient(base_url=self.base_url, timeout=httpx.Timeout(self.timeout))
+        return self._client
+
+    async def stream_reply(self, payload: dict, send) -> Optional[dict]:
+        """
+        Stream a reply, calling `await send(sentence)` for each sentence in order.
+
+        Sending runs alongside reading, so a slow send doesn't hold up the
+        stream. Returns the final {"assistant_response", "user_profile"} dict,
+        or None if the call failed before anything was sent. If it fails part
+        way through, the text sent so far is returned with no user_profile.
+        """
+        sentences = asyncio.Queue()
+        sent = []
+        started = time.perf_counter()
+
+        async def sender():
+            while True:
+                sentence = await sentences.get()
+                if sentence is None:
+                    return
+                if not sent:
+                    instrumentation.operation_seconds.observe(time.perf_counter() - started, "schat_first_sentence")
+                await send(sentence)
+                sent.append(sentence)
+
+        sender_task = asyncio.ensure_future(sender())
+        splitter = SentenceSplitter()
+        deltas = []
+        final = None
+        try:
+            with instrumentation.track("schat", f"POST {self.path}") as call:
+                async with self._get_client().stream("POST", self.path, json=payload) as response:
+                    if response.status_code != 200:
+                        call.failed()
+                        body = await response.aread()
+                        print(f"Error streaming AI matchmaker reply: HTTP {response.status_code}, Response: {body.decode('utf-8')}")
+                    else:
+                        async for line in response.aiter_lines():
+                            if not line.strip():
+                                continue
+                            event = json.loads(line)
+                            if "delta" in event:
+                                deltas.append(event["delta"])
+                                for sentence in splitter.feed(event["delta"]):
+                                    sentences.put_nowait(sentence)
+                            else:
+                                final = event
+        except Exception as e:
+            print(f"Error streaming AI matchmaker reply: {e}")
+
+        if final is not None and not deltas:
+            # The server sent the whole reply in one go
+            for sentence in splitter.feed(final.get("assistant_response") or ""):
+                sentences.put_nowait(sentence)
+        for sentence in splitter.flush():
+            sentences.put_nowait(sentence)
+        sentences.put_nowait(None)
+        await sender_task
+
+        if final is None:
+            if not sent:
+                return None
+            final = {"user_profile": None}
+        final.setdefault("assistant_response", "".join(deltas) or " ".join(sent))
+        return final
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -0,0 +1,173 @@
+import json
+import os
+import threading
+from concurrent.futures import Future
+
+from cache import LRUCache
+
+
+# Function to normalise an attribute value so equivalent answers share a cache entry
+def normalize_value(value) -> str:
+    if value is None:
+        return "not specified"
+    return " ".join(str(value).lower().split()) or "not specified"
+
+
+class PairScoreStore:
+    """
+    Memoised attribute compatibility scores.
+
+    Keys are (attribute, normalised value 1, normalised value 2) with the two
+    values sorted, so the score for (A, B) is reused for (B, A). The store is
+    LRU-bounded and counts hits and misses. It can be saved to and loaded
+    from a JSON file; saving merges with the file's current contents, and a
+    running server can reload the file when another process updates it.
+
+    Scores are unweighted, so one computed in A's run is reused in B's run
+    under B's own weights. claim() makes missing scores single-flight: the
+    first caller computes a key and later callers wait for its result.
+    """
+
+    def __init__(self, maxsize: int = 100000, path: str = None):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self._scores = LRUCache(maxsize)
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._stop = threading.Event()
+        self._reloader = None
+
+    def __len__(self):
+        return len(self._scores)
+
+    def __contains__(self, key: tuple):
+        return key in self._scores
+
+    def keys(self) -> list:
+        return [key for key, _ in self._scores.items()]
+
+    @staticmethod
+    def key(attribute: str, value_1, value_2) -> tuple:
+        value_1, value_2 = sorted((normalize_value(value_1), normalize_value(value_2)))
+        return attribute, value_1, value_2
+
+    def get(self, attribute: str, value_1, value_2):
+        score = self._scores.get(self.key(attribute, value_1, value_2))
+        with self._lock:
+            if score is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return score
+
+    def set(self, attribute: str, value_1, value_2, score):
+        key = self.key(attribute, value_1, value_2)
+        self._scores.set(key, score)
+        with self._lock:
+            future = self._inflight.pop(key, None)
+        if future is not None:
+            future.set_result(score)
+
+    def claim(self, attribute: str, value_1, value_2):
+        """
+        Claim a missing score before computing it.
+
+        Returns:
+        - None if the caller now owns the key and must set() or release() it,
+          or a Future for the score another caller is already computing
+          (its result is None if that caller gave up).
+        """
+        key = self.key(attribute, value_1, value_2)
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is None:
+                score = self._scores.get(key)
+                if score is None:
+                    self._inflight[key] = Future()
+                    return None
+                # Stored since the caller's get()
+                future = Future()
+                future.set_result(score)
+            self.shared += 1
+            return future
+
+    # Function to give up a claimed key without a score, waking anyone waiting on it
+    def release(self, attribute: str, value_1, value_2):
+        with self._lock:
+            future = self._inflight.pop(self.key(attribute, value_1, value_2), None)
+        if future is not None:
+            future.set_result(None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "shared": self.shared,
+                "size": len(self._scores)
+            }
+
+    def _read(self, path: str) -> list:
+        if not os.path.exists(path):
+            return []
+        with open(path) as f:
+            return json.load(f)
+
+    # Function to persist the scores, merged with whatever another process (e.g. batchScoring) saved
+    def save(self, path: str = None) -> bool:
+        path = path or self.path
+        if not path:
+            return False
+        try:
+            merged = {tuple(entry[:3]): entry[3] for entry in self._read(path)}
+            merged.update(self._scores.items())
+            entries = [[*key, score] for key, score in merged.items()]
+            with open(f"{path}.tmp", "w") as f:
+                json.dump(entries, f)
+            os.replace(f"{path}.tmp", path)
+            self._mtime = os.path.getmtime(path)
+            print(f"Saved {len(entries)} pairwise scores to {path}")
+            return True
+        except Exception as e:
+            print(f"Error saving pairwise scores: {e}")
+            return False
+
+    def load(self, path: str = None):
+        path = path or self.path
+        if not path or not os.path.exists(path):
+            return
+        try:
+            mtime = os.path.getmtime(path)
+            entries = self._read(path)
+            for attribute, value_1, value_2, score in entries:
+                self._scores.set((attribute, value_1, value_2), score)
+            self._mtime = mtime
+            print(f"Loaded {len(entries)} pairwise scores from {path}")
+        except Exception as e:
+            print(f"Error loading pairwise scores: {e}")
+
+    # Function to pick up scores another process has saved since the last load or save
+    def reload(self):
+        if self.path and os.path.exists(self.path) and os.path.getmtime(self.path) != self._mtime:
+            self.load()
+
+    def _reload_loop(self, interval: float):
+        while not self._stop.wait(interval):
+            self.reload()
+
+    # Function to reload the file every `interval` seconds in the background
+    def start(self, interval: float):
+        if not self.path or not interval or self._reloader is not None:
+            return
+        self._stop.clear()
+        self._reloader = threading.Thread(target=self._reload_loop, args=(interval,), daemon=True)
+        self._reloader.start()
+
+    def stop(self):
+        self._stop.set()
+        self._reloader = None
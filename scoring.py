@@ -0,0 +1,342 @@
+import heapq
+import re
+import threading
+import zlib
+from decimal import Decimal
+
+import numpy as np
+
+import indexSync
+
+# Profile attributes scored by the matchmaker (same keys as the generate_dynamic_weights schema)
+ATTRIBUTES = [
+    "relationship_goals",
+    "appearance",
+    "location",
+    "spirituality",
+    "personality_attributes",
+    "age",
+    "interests",
+    "identity_and_preference",
+    "kids",
+    "smoking",
+    "pets",
+    "career_goals",
+    "annual_income",
+    "willingness_to_travel",
+    "special_requests"
+]
+
+# Numeric attributes and the difference at which their similarity drops to zero
+NUMERIC_ATTRIBUTES = {
+    "age": 15.0,
+    "annual_income": 100000.0
+}
+
+TEXT_ATTRIBUTES = [attribute for attribute in ATTRIBUTES if attribute not in NUMERIC_ATTRIBUTES]
+
+# Size of the hashed bag-of-words vector used for every free-text attribute
+TEXT_DIM = 32
+
+# Attribute scores use the same 1-10 scale as the LLM compatibility scores
+MIN_SCORE = 1.0
+MAX_SCORE = 10.0
+NEUTRAL_SCORE = (MIN_SCORE + MAX_SCORE) / 2
+
+_TOKEN_RE = re.compile(r"[a-z0-9']+")
+_NUMBER_RE = re.compile(r"(\d+(?:\.\d+)?)\s*([km])?\b")
+
+
+def tokenize(text) -> list:
+    if text is None:
+        return []
+    return _TOKEN_RE.findall(str(text).lower())
+
+
+# Function to encode free text into a signed, L2-normalised hashed bag-of-words vector
+def hash_text(text, dim: int = TEXT_DIM) -> np.ndarray:
+    return hash_tokens(tokenize(text), dim)
+
+
+def hash_tokens(tokens, dim: int = TEXT_DIM) -> np.ndarray:
+    vector = np.zeros(dim, dtype=np.float32)
+    for token in tokens:
+        digest = zlib.crc32(token.encode("utf-8"))
+        vector[digest % dim] += 1.0 if (digest >> 31) & 1 else -1.0
+
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return vector
+
+
+# Function to pull the first number out of a profile value such as "29", "$85k" or "120,000"
+def parse_number(value) -> float:
+    if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+        return float(value)
+    if value is None:
+        return np.nan
+
+    match = _NUMBER_RE.search(str(value).lower().replace(",", ""))
+    if not match:
+        return np.nan
+
+    number = float(match.group(1))
+    if match.group(2) == "k":
+        number *= 1000
+    elif match.group(2) == "m":
+        number *= 1000000
+    return number
+
+
+def weights_vector(weights: dict) -> np.ndarray:
+    """
+    Convert a dynamic weights dict into a vector ordered like ATTRIBUTES.
+
+    Falls back to uniform weights when no weights could be generated.
+    """
+    if not weights:
+        return np.ones(len(ATTRIBUTES), dtype=np.float32)
+    return np.array([float(weights.get(attribute, 0) or 0) for attribute in ATTRIBUTES], dtype=np.float32)
+
+
+def bounded_top_k(candidate_ids: list, weights: dict, score_stage, k: int, stages: int = 3) -> list:
+    """
+    Branch-and-bound top-K over an expensive per-attribute scorer.
+
+    Attributes are scored in `stages` groups, heaviest weights first, by
+    `score_stage(stage_weights, candidate_ids)`, which returns UserID ->
+    weighted score for those attributes. After each stage a candidate's
+    unscored attributes bound its total between MIN_SCORE and MAX_SCORE;
+    a min-heap of the K best lower bounds gives the threshold, and
+    candidates whose upper bound falls below it are dropped.
+
+    Returns:
+    - A list of up to k (UserID, score) tuples, best first.
+    """
+    order = sorted(weights, key=lambda attribute: float(weights[attribute] or 0), reverse=True)
+    stage_size = max(1, -(-len(order) // max(stages, 1)))
+    remaining = sum(float(weights[attribute] or 0) for attribute in order)
+    partial = {candidate_id: 0.0 for candidate_id in candidate_ids}
+    live = list(partial)
+
+    start = 0
+    while start < len(order) and live:
+        # Nothing can be pruned once only k candidates are left, so finish in one stage
+        end = len(order) if len(live) <= k else start + stage_size
+        stage = {attribute: weights[attribute] for attribute in order[start:end]}
+        stage_weight = sum(float(weight or 0) for weight in stage.values())
+        scores = score_stage(stage, live)
+        for candidate_id in live:
+            partial[candidate_id] += scores.get(candidate_id, NEUTRAL_SCORE * stage_weight)
+        remaining -= stage_weight
+        start = end
+
+        if len(live) > k and start < len(order):
+            heap = []
+            for candidate_id in live:
+                lower = partial[candidate_id] + MIN_SCORE * remaining
+                if len(heap) < k:
+                    heapq.heappush(heap, lower)
+                elif lower > heap[0]:
+                    heapq.heapreplace(heap, lower)
+            threshold = heap[0]
+            survivors = [candidate_id for candidate_id in live if partial[candidate_id] + MAX_SCORE * remaining >= threshold]
+            print(f"Bounded top-{k}: {len(survivors)} of {len(live)} candidates left after {start} of {len(order)} attributes")
+            live = survivors
+
+    return heapq.nlargest(k, ((candidate_id, partial[candidate_id]) for candidate_id in live), key=lambda item: item[1])
+
+
+def encode_profile(profile, dim: int = TEXT_DIM):
+    """
+    Encode a parsed profile (profiles.Profile) into its text and numeric feature rows.
+
+    Returns:
+    - A (len(TEXT_ATTRIBUTES), dim) float32 array and a (len(NUMERIC_ATTRIBUTES),) float32 array.
+    """
+    text_row = np.stack([hash_text(profile.get(attribute), dim) for attribute in TEXT_ATTRIBUTES])
+    numbers = (getattr(profile, attribute) for attribute in NUMERIC_ATTRIBUTES)
+    numeric_row = np.array([np.nan if number is None else number for number in numbers], dtype=np.float32)
+    return text_row, numeric_row
+
+
+class ProfileMatrix:
+    """
+    NumPy feature matrix over every profile's scored attributes.
+
+    Rows are kept in sync incrementally so a match request only pays for the
+    vectorised scoring pass, not for re-encoding the whole user base. Rows
+    are encoded from parsed profiles (profiles.Profile), whose age and
+    income are already numbers.
+    """
+
+    def __init__(self, dim: int = TEXT_DIM, capacity: int = 1024):
+        self.dim = dim
+        self.user_ids = []
+        self.index = {}
+        self._profiles = []
+        self._text = np.zeros((capacity, len(TEXT_ATTRIBUTES), dim), dtype=np.float32)
+        self._text_present = np.zeros((capacity, len(TEXT_ATTRIBUTES)), dtype=bool)
+        self._numeric = np.full((capacity, len(NUMERIC_ATTRIBUTES)), np.nan, dtype=np.float32)
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def _grow(self, size: int):
+        capacity = self._text.shape[0]
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+
+        size = len(self.user_ids)
+        text = np.zeros((capacity, len(TEXT_ATTRIBUTES), self.dim), dtype=np.float32)
+        text_present = np.zeros((capacity, len(TEXT_ATTRIBUTES)), dtype=bool)
+        numeric = np.full((capacity, len(NUMERIC_ATTRIBUTES)), np.nan, dtype=np.float32)
+        text[:size] = self._text[:size]
+        text_present[:size] = self._text_present[:size]
+        numeric[:size] = self._numeric[:size]
+        self._text, self._text_present, self._numeric = text, text_present, numeric
+
+    # Function to insert or re-encode a single parsed profile
+    def upsert(self, profile):
+        user_id = profile.user_id
+
+        with self._lock:
+            row = self.index.get(user_id)
+            if row is not None and self._profiles[row].texts == profile.texts:
+                self._profiles[row] = profile
+                return
+
+            text_row, numeric_row = encode_profile(profile, self.dim)
+            if row is None:
+                row = len(self.user_ids)
+                self._grow(row + 1)
+                self.user_ids.append(user_id)
+                self._profiles.append(profile)
+                self.index[user_id] = row
+            else:
+                self._profiles[row] = profile
+
+            self._text[row] = text_row
+            self._text_present[row] = text_row.any(axis=1)
+            self._numeric[row] = numeric_row
+
+    # Function to drop a profile, moving the last row into its slot
+    def remove(self, user_id: str):
+        with self._lock:
+            row = self.index.pop(user_id, None)
+            if row is None:
+                return
+
+            last = len(self.user_ids) - 1
+            if row != last:
+                moved_id = self.user_ids[last]
+                self.user_ids[row] = moved_id
+                self._profiles[row] = self._profiles[last]
+                self._text[row] = self._text[last]
+                self._text_present[row] = self._text_present[last]
+                self._numeric[row] = self._numeric[last]
+                self.index[moved_id] = row
+
+            self.user_ids.pop()
+            self._profiles.pop()
+
+    # Function to bring the matrix in line with a full list of parsed profiles
+    def sync(self, all_profiles: list):
+        indexSync.sync_index(self._lock, all_profiles, self.upsert, self.remove, lambda: self.user_ids)
+
+    def attribute_scores(self, profile, rows=None) -> np.ndarray:
+        """
+        Score every attribute of the given profile against all (or the selected) rows.
+
+        Returns:
+        - An (n, len(ATTRIBUTES)) array of attribute scores on the 1-10 scale.
+        """
+        text_row, numeric_row = encode_profile(profile, self.dim)
+
+        with self._lock:
+            size = len(self.user_ids)
+            text = self._text[:size] if rows is None else self._text[rows]
+            text_present = self._text_present[:size] if rows is None else self._text_present[rows]
+            numeric = self._numeric[:size] if rows is None else self._numeric[rows]
+
+            # Cosine similarity per text attribute (rows are already normalised)
+            text_similarity = np.clip(np.einsum("nad,ad->na", text, text_row), 0.0, 1.0)
+            text_scores = MIN_SCORE + (MAX_SCORE - MIN_SCORE) * text_similarity
+            text_scores[~(text_present & text_row.any(axis=1))] = NEUTRAL_SCORE
+
+            # Linear fall-off of similarity with the numeric difference
+            scales = np.array(list(NUMERIC_ATTRIBUTES.values()), dtype=np.float32)
+            numeric_similarity = np.clip(1.0 - np.abs(numeric - numeric_row) / scales, 0.0, 1.0)
+            numeric_scores = MIN_SCORE + (MAX_SCORE - MIN_SCORE) * numeric_similarity
+            numeric_scores[np.isnan(numeric_scores)] = NEUTRAL_SCORE
+
+        scores = np.empty((text_scores.shape[0], len(ATTRIBUTES)), dtype=np.float32)
+        scores[:, [ATTRIBUTES.index(attribute) for attribute in TEXT_ATTRIBUTES]] = text_scores
+        scores[:, [ATTRIBUTES.index(attribute) for attribute in NUMERIC_ATTRIBUTES]] = numeric_scores
+        return scores
+
+    def score(self, profile, weights: dict, rows=None) -> np.ndarray:
+        """
+        Weighted compatibility score of the given profile against all (or the selected) rows.
+        """
+        return self.attribute_scores(profile, rows) @ weights_vector(weights)
+
+    def reverse_scores(self, profile, weights_by_user: dict) -> dict:
+        """
+        Score the given profile as a candidate for every row, using each row's own weights.
+
+        Attribute similarities are symmetric, so one pass over the matrix gives
+        the profile's score in every other user's ranking.
+
+        Returns:
+        - A dict of UserID -> score for the rows that have weights.
+        """
+        with self._lock:
+            user_ids = list(self.user_ids)
+            attribute_scores = self.attribute_scores(profile)
+
+        rows = [row for row, user_id in enumerate(user_ids) if user_id in weights_by_user]
+        if not rows:
+            return {}
+
+        weights = np.stack([weights_vector(weights_by_user[user_ids[row]]) for row in rows])
+        scores = np.einsum("na,na->n", attribute_scores[rows], weights)
+        return {user_ids[row]: float(score) for row, score in zip(rows, scores)}
+
+    def top_k(self, profile, weights: dict, k: int, candidate_ids=None) -> list:
+        """
+        Rank candidates for a profile in one vectorised pass.
+
+        Returns:
+        - A list of (UserID, score) tuples, best first, excluding the user themself.
+        """
+        with self._lock:
+            self_row = self.index.get(profile.user_id)
+            if candidate_ids is None:
+                # Score the whole matrix without copying it, then mask the user out
+                rows = np.arange(len(self.user_ids))
+                scores = self.score(profile, weights)
+                if self_row is not None:
+                    scores[self_row] = -np.inf
+                    available = len(rows) - 1
+                else:
+                    available = len(rows)
+            else:
+                rows = np.array([self.index[user_id] for user_id in candidate_ids if user_id in self.index],
+                                dtype=np.intp)
+                if self_row is not None:
+                    rows = rows[rows != self_row]
+                scores = self.score(profile, weights, rows) if rows.size else np.empty(0)
+                available = rows.size
+
+            k = min(k, available)
+            if k <= 0:
+                return []
+
+            best = np.argpartition(-scores, k - 1)[:k]
+            best = best[np.argsort(-scores[best])]
+            return [(self.user_ids[rows[i]], float(scores[i])) for i in best]
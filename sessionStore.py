@@ -0,0 +1,97 @@
+import json
+import threading
+import time
+
+from boto3.dynamodb.conditions import Attr
+from botocore.exceptions import ClientError
+
+from cache import LRUCache
+
+# Conversation state tracked for every chat
+DEFAULT_STATE = {
+    "awaiting_email": False,
+    "awaiting_chat_confirmation": False,
+    "user_email": None,
+    "channel_category_id": None
+}
+
+
+class InMemorySessionStore:
+    """
+    Per-chat conversation state held in an in-process LRU with a TTL.
+
+    Only safe with a single worker process; use DynamoSessionStore to share
+    state between workers and nodes.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 86400):
+        self._sessions = LRUCache(maxsize, ttl)
+        self._lock = threading.Lock()
+
+    def load(self, key: str):
+        """
+        Returns:
+        - A (state, version) tuple; version 0 means no state has been saved yet.
+        """
+        state, version = self._sessions.get(key, (DEFAULT_STATE, 0))
+        return dict(state), version
+
+    def save(self, key: str, state: dict, expected_version: int) -> bool:
+        """
+        Save the state only if nobody else has saved it since it was loaded.
+
+        Returns:
+        - False when the conditional write lost to a concurrent update.
+        """
+        with self._lock:
+            _, version = self._sessions.get(key, (DEFAULT_STATE, 0))
+            if version != expected_version:
+                return False
+            self._sessions.set(key, (dict(state), version + 1))
+            return True
+
+
+class DynamoSessionStore:
+    """
+    Per-chat conversation state in a DynamoDB table (hash key SessionKey).
+
+    Writes are conditional on the version that was loaded, and ExpiresAt is
+    meant to be configured as the table's TTL attribute.
+    """
+
+    def __init__(self, table, ttl: float = 86400):
+        self.table = table
+        self.ttl = ttl
+
+    def load(self, key: str):
+        item = self.table.get_item(Key={'SessionKey': key}, ConsistentRead=True).get('Item')
+        if not item:
+            return dict(DEFAULT_STATE), 0
+
+        version = int(item['Version'])
+        # DynamoDB deletes expired items lazily, so check the expiry ourselves
+        if int(item['ExpiresAt']) <= time.time():
+            return dict(DEFAULT_STATE), version
+        return {**DEFAULT_STATE, **json.loads(item['State'])}, version
+
+    def save(self, key: str, state: dict, expected_version: int) -> bool:
+        if expected_version:
+            condition = Attr('Version').eq(expected_version)
+        else:
+            condition = Attr('SessionKey').not_exists()
+
+        try:
+            self.table.put_item(
+                Item={
+                    'SessionKey': key,
+                    'State': json.dumps(state),
+                    'Version': expected_version + 1,
+                    'ExpiresAt': int(time.time() + self.ttl)
+                },
+                ConditionExpression=condition
+            )
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return False
+            raise
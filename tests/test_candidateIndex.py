@@ -0,0 +1,146 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import candidateIndex
+from candidateIndex import UNKNOWN
+from profiles import Profile
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("want kids someday", "wants"),
+    ("Don't have kids yet but want them someday", "wants"),
+    ("No kids yet, would love some", "wants"),
+    ("don't want kids", "doesnt_want"),
+    ("Child-free by choice", "doesnt_want"),
+    ("I have two kids and don't want more", "doesnt_want"),
+    ("have two kids", "has"),
+    ("Mom of a 6 year old", "has"),
+    ("open to kids", UNKNOWN),
+    ("no kids", UNKNOWN),
+    ("Not sure, I want kids but don't want them soon", UNKNOWN),
+    ("", UNKNOWN),
+    (None, UNKNOWN),
+])
+def test_classify_kids(text, expected):
+    assert candidateIndex.classify_kids(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("social smoker", "smoker"),
+    ("smoke occasionally", "smoker"),
+    ("I vape", "smoker"),
+    ("non-smoker", "non_smoker"),
+    ("never smoked", "non_smoker"),
+    ("I don't smoke", "non_smoker"),
+    ("Smoke-free", "non_smoker"),
+    ("smoke free home please", "non_smoker"),
+    ("Ex-smoker", "non_smoker"),
+    ("Former smoker, quit 5 years ago", "non_smoker"),
+    ("no smokers please", "no_smokers"),
+    ("Smoker, trying to quit", UNKNOWN),
+    ("", UNKNOWN),
+])
+def test_classify_smoking(text, expected):
+    assert candidateIndex.classify_smoking(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("have a dog", "has_pets"),
+    ("two cats", "has_pets"),
+    ("My dog comes first", "has_pets"),
+    ("allergic to cats", "no_pets"),
+    ("no pets", "no_pets"),
+    ("Don't want any pets", "no_pets"),
+    ("Love dogs but don't have any", UNKNOWN),
+    ("love cats", UNKNOWN),
+    ("I have a cat but I'm allergic to dogs", UNKNOWN),
+    ("", UNKNOWN),
+])
+def test_classify_pets(text, expected):
+    assert candidateIndex.classify_pets(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("yes, happy to relocate", "willing"),
+    ("willing to travel", "willing"),
+    ("I don't mind travelling", "willing"),
+    ("Can't wait to travel more", "willing"),
+    ("Never been abroad but open to it", "willing"),
+    ("prefer to stay local", "unwilling"),
+    ("no", "unwilling"),
+    ("I won't relocate", "unwilling"),
+    ("Not willing to do long distance", "unwilling"),
+    ("Happy to travel but won't relocate", UNKNOWN),
+    ("depends", UNKNOWN),
+    ("", UNKNOWN),
+])
+def test_classify_travel(text, expected):
+    assert candidateIndex.classify_travel(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Straight man looking for women", ("man", ("woman",))),
+    ("Woman seeking men", ("woman", ("man",))),
+    ("Gay man", ("man", ("man",))),
+    ("Straight woman", ("woman", ("man",))),
+    ("Bisexual woman", ("woman", UNKNOWN)),
+    ("Man, interested in anyone", ("man", UNKNOWN)),
+    ("Gay man, not interested in women", ("man", UNKNOWN)),
+    ("Woman, not into men", ("woman", UNKNOWN)),
+    ("Man, never dating women again", ("man", UNKNOWN)),
+    ("I'm not looking for men", (UNKNOWN, UNKNOWN)),
+    ("", (UNKNOWN, UNKNOWN)),
+])
+def test_parse_identity(text, expected):
+    assert candidateIndex.parse_identity(text) == expected
+
+
+def build_index(items):
+    return candidateIndex.CandidateIndex([Profile.from_item(item) for item in items])
+
+
+def test_negated_preference_never_filters():
+    index = build_index([
+        {'UserID': 'a', 'UserProfile': {'identity_and_preference': "Straight woman"}},
+        {'UserID': 'b', 'UserProfile': {'identity_and_preference': "Gay man"}}
+    ])
+    requester = Profile.from_item({'UserID': 'r', 'UserProfile': {'identity_and_preference': "Gay man, not interested in women"}})
+    assert 'b' in [profile.user_id for profile in index.filter_candidates(requester)]
+
+
+def test_unknown_never_excludes():
+    index = build_index([
+        {'UserID': 'a', 'UserProfile': {'kids': "Don't have kids yet but want them someday"}},
+        {'UserID': 'b', 'UserProfile': {'kids': "no kids"}},
+        {'UserID': 'c', 'UserProfile': {'kids': "don't want kids"}}
+    ])
+    requester = Profile.from_item({'UserID': 'r', 'UserProfile': {'kids': "want kids someday"}})
+    assert [profile.user_id for profile in index.filter_candidates(requester)] == ['a', 'b']
+
+
+def test_orientation_filters_both_ways():
+    index = build_index([
+        {'UserID': 'a', 'UserProfile': {'identity_and_preference': "Straight woman"}},
+        {'UserID': 'b', 'UserProfile': {'identity_and_preference': "Gay man"}},
+        {'UserID': 'c', 'UserProfile': {'identity_and_preference': "Lesbian woman"}},
+        {'UserID': 'd', 'UserProfile': {}}
+    ])
+    requester = Profile.from_item({'UserID': 'r', 'UserProfile': {'identity_and_preference': "Straight man"}})
+    assert [profile.user_id for profile in index.filter_candidates(requester)] == ['a', 'd']
+
+
+def test_reindexes_only_changed_profiles():
+    index = build_index([
+        {'UserID': 'a', 'UserProfile': {'age': "30"}},
+        {'UserID': 'b', 'UserProfile': {'age': "45"}}
+    ])
+    requester = Profile.from_item({'UserID': 'r', 'UserProfile': {'age': "32, looking for 28-35"}})
+    assert index.filter_ids(requester, ['a', 'b']) == ['a']
+
+    index.add(Profile.from_item({'UserID': 'b', 'UserProfile': {'age': "34"}}))
+    index.remove('a')
+    assert index.filter_ids(requester, ['a', 'b']) == ['b']
@@ -0,0 +1,105 @@
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import openaiClient
+
+
+class APIError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(status_code=status_code, headers=headers or {})
+
+
+def make_client(create, **kwargs):
+    options = dict(rpm=60000, tpm=10 ** 9, max_concurrency=4, base_delay=0.001, max_delay=0.01)
+    options.update(kwargs)
+    return openaiClient.GovernedOpenAIClient(create, **options)
+
+
+def failing(errors):
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return SimpleNamespace(choices=[], usage=None)
+
+    return create, calls
+
+
+def test_retries_429_and_halves_the_limit():
+    create, calls = failing([APIError(429), APIError(429)])
+    client = make_client(create)
+    client.chat_completion(messages=[])
+    assert len(calls) == 3
+    # Halved twice (4 -> 2 -> 1), then one additive step on success
+    assert client.limit == pytest.approx(2.0)
+
+
+def test_retries_5xx_without_touching_the_limit():
+    create, calls = failing([APIError(503)])
+    client = make_client(create)
+    client.chat_completion(messages=[])
+    assert len(calls) == 2
+    assert client.limit == 4
+
+
+def test_client_errors_are_not_retried():
+    create, calls = failing([APIError(400)])
+    client = make_client(create)
+    with pytest.raises(APIError):
+        client.chat_completion(messages=[])
+    assert len(calls) == 1
+
+
+def test_gives_up_after_max_retries():
+    create, calls = failing([APIError(429)] * 10)
+    client = make_client(create, max_retries=2)
+    with pytest.raises(APIError):
+        client.chat_completion(messages=[])
+    assert len(calls) == 3
+
+
+def test_backoff_honours_retry_after():
+    client = make_client(lambda **kwargs: None)
+    assert client._backoff(0, APIError(429, {"retry-after": "2"})) >= 2
+
+
+def test_interactive_calls_are_admitted_before_bulk():
+    started = threading.Event()
+    release = threading.Event()
+    order = []
+
+    def create(**kwargs):
+        if kwargs["name"] == "first":
+            started.set()
+            release.wait(5)
+        order.append(kwargs["name"])
+        return SimpleNamespace(choices=[], usage=None)
+
+    client = make_client(create, max_concurrency=1)
+    threads = [threading.Thread(target=client.chat_completion, kwargs={"name": "first", "messages": []})]
+    threads[0].start()
+    started.wait(5)
+
+    # Queue a bulk call, then an interactive one, while the only slot is taken
+    for name, priority in (("bulk", openaiClient.BULK), ("interactive", openaiClient.INTERACTIVE)):
+        thread = threading.Thread(target=client.chat_completion, kwargs={"name": name, "priority": priority, "messages": []})
+        thread.start()
+        threads.append(thread)
+        while client.stats()["waiting"] < len(threads) - 1:
+            time.sleep(0.001)
+
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert order == ["first", "interactive", "bulk"]
@@ -0,0 +1,60 @@
+import math
+import os
+import sys
+from decimal import Decimal
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import candidateIndex
+from candidateIndex import UNKNOWN
+from profiles import Profile, ProfileBatch
+
+
+def parse(**user_profile):
+    return Profile.from_item({'UserID': 'u', 'UpdatedAt': Decimal(5), 'UserProfile': user_profile})
+
+
+def test_numbers_are_parsed_once():
+    profile = parse(age="31, prefer 28-35", annual_income=Decimal("85000"))
+    assert (profile.age, profile.min_age, profile.max_age) == (31, 28, 35)
+    assert profile.annual_income == 85000.0
+    assert profile.updated_at == 5
+
+
+@pytest.mark.parametrize("field, text, expected", [
+    ("kids", "want kids someday", "wants"),
+    ("smoking", "non-smoker", "non_smoker"),
+    ("pets", "have a dog", "has_pets"),
+    ("location", "Austin, TX", "austin"),
+    ("willingness_to_travel", "prefer to stay local", "unwilling"),
+    ("kids", None, UNKNOWN),
+])
+def test_categories_are_codes(field, text, expected):
+    profile = parse(**{field: text})
+    assert isinstance(getattr(profile, field), int)
+    assert profile.category(field) == expected
+
+
+def test_identity_codes():
+    profile = parse(identity_and_preference="Straight man looking for women")
+    assert profile.category("gender") == "man"
+    assert profile.seeks == candidateIndex.seeks_mask(("woman",))
+    assert parse(identity_and_preference="Bisexual woman").seeks == 0
+
+
+def test_texts_are_normalised_and_shared():
+    first, second = parse(interests="hiking   and\ncooking"), parse(interests="hiking and cooking")
+    assert first.get("interests") == "hiking and cooking"
+    assert first.texts == second.texts
+    assert first.get("interests") is second.get("interests")
+    assert first.get("appearance", "Not specified") == "Not specified"
+
+
+def test_batch_columns():
+    batch = ProfileBatch([parse(age="30", kids="no kids"), parse(annual_income="$120k")])
+    assert batch.age[0] == 30 and math.isnan(batch.age[1])
+    assert batch.annual_income[1] == 120000
+    assert list(batch.codes["kids"]) == [0, 0]
+    assert batch.texts("kids") == ["no kids", None]
@@ -0,0 +1,105 @@
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Future
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import matchMakingAlgorithm
+import profiles
+import scoreStore
+import scoring
+
+
+@pytest.fixture
+def pair_scores(monkeypatch):
+    store = scoreStore.PairScoreStore()
+    monkeypatch.setattr(matchMakingAlgorithm, "pair_scores", store)
+    return store
+
+
+def test_key_is_order_and_whitespace_insensitive():
+    assert scoreStore.PairScoreStore.key("pets", "Have  a DOG", None) == scoreStore.PairScoreStore.key("pets", None, "have a dog")
+
+
+def test_waiter_receives_the_owners_score(pair_scores):
+    assert pair_scores.claim("pets", "dog", "cat") is None
+    future = pair_scores.claim("pets", "cat", "dog")
+    assert not future.done()
+
+    pair_scores.set("pets", "dog", "cat", 7)
+    assert future.result(timeout=1) == 7
+    assert pair_scores.get("pets", "dog", "cat") == 7
+    assert pair_scores.stats()["shared"] == 1
+
+
+def test_claim_after_set_returns_the_stored_score(pair_scores):
+    pair_scores.set("pets", "dog", "cat", 4)
+    assert pair_scores.claim("pets", "dog", "cat").result(timeout=0) == 4
+
+
+def test_release_wakes_waiters_with_none(pair_scores):
+    assert pair_scores.claim("pets", "dog", "cat") is None
+    future = pair_scores.claim("pets", "dog", "cat")
+    pair_scores.release("pets", "dog", "cat")
+    assert future.result(timeout=1) is None
+
+    # The key is free again for the next caller to compute
+    assert pair_scores.claim("pets", "dog", "cat") is None
+
+
+def test_released_score_counts_as_neutral(pair_scores):
+    assert pair_scores.claim("pets", "dog", "cat") is None
+    waiting = [("u", "pets", pair_scores.claim("pets", "dog", "cat"))]
+    pair_scores.release("pets", "dog", "cat")
+
+    compatibility_scores = {}
+    matchMakingAlgorithm.wait_for_shared_scores(waiting, {"pets": 0.5}, compatibility_scores)
+    assert compatibility_scores == {"u": scoring.NEUTRAL_SCORE * 0.5}
+
+
+def test_wait_shares_one_deadline(monkeypatch):
+    monkeypatch.setattr(matchMakingAlgorithm, "PAIR_SCORE_WAIT_TIMEOUT", 0.1)
+    waiting = [(f"u{number}", "pets", Future()) for number in range(5)]
+
+    compatibility_scores = {}
+    started = time.monotonic()
+    matchMakingAlgorithm.wait_for_shared_scores(waiting, {"pets": 1}, compatibility_scores)
+
+    # Five unanswered futures wait about one timeout in total, not one each
+    assert time.monotonic() - started < 0.3
+    assert compatibility_scores == {f"u{number}": scoring.NEUTRAL_SCORE for number in range(5)}
+
+
+def test_concurrent_blocks_score_a_shared_pair_once(pair_scores, monkeypatch):
+    calls = []
+    release = threading.Event()
+
+    def call_openai(json_schema, messages, priority=None):
+        calls.append(messages)
+        release.wait(5)
+        return [json.dumps({"candidates": [{"candidate": "c1", "scores": {"pets": 9}}]})]
+
+    monkeypatch.setattr(matchMakingAlgorithm, "call_openai_assistant_batch", call_openai)
+    user = profiles.Profile.from_item({'UserID': 'u', 'UserProfile': {'pets': "have a dog"}})
+    candidate = profiles.Profile.from_item({'UserID': 'c', 'UserProfile': {'pets': "two cats"}})
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(
+        matchMakingAlgorithm.score_candidate_block(user, [candidate], {"pets": 1}))) for _ in range(2)]
+    threads[0].start()
+    while not calls:
+        time.sleep(0.001)
+    threads[1].start()
+    while pair_scores.stats()["shared"] < 1:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert results == [{"c": 9}, {"c": 9}]
@@ -0,0 +1,108 @@
+import hashlib
+import json
+import os
+import time
+
+from cache import LRUCache
+import scoring
+
+
+# Function to compute a stable hash of the profile fields used in the weights prompt
+def profile_hash(user_profile: dict) -> str:
+    user_profile = user_profile or {}
+    fields = {attribute: str(user_profile.get(attribute)) for attribute in scoring.ATTRIBUTES}
+    return hashlib.sha256(json.dumps(fields, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class WeightsCache:
+    """
+    Content-addressed cache for generate_dynamic_weights results.
+
+    Entries are keyed by a hash of the prompt fields, bounded by an LRU and a
+    TTL, and optionally backed by a directory of JSON files or a DynamoDB
+    table (hash key ProfileHash) so they survive restarts.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 86400, directory: str = None, table=None):
+        self.ttl = ttl
+        self.directory = directory
+        self.table = table
+        self._memory = LRUCache(maxsize, ttl)
+        self._user_keys = LRUCache(maxsize)
+
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _load_backing(self, key: str):
+        now = time.time()
+        try:
+            if self.directory and os.path.exists(self._path(key)):
+                with open(self._path(key)) as f:
+                    entry = json.load(f)
+                if not self.ttl or entry["stored_at"] + self.ttl > now:
+                    return entry["weights"]
+
+            if self.table is not None:
+                item = self.table.get_item(Key={'ProfileHash': key}).get('Item')
+                if item and (not self.ttl or int(item['ExpiresAt']) > now):
+                    return json.loads(item['Weights'])
+        except Exception as e:
+            print(f"Error reading cached weights: {e}")
+        return None
+
+    def _store_backing(self, key: str, weights: dict):
+        now = time.time()
+        try:
+            if self.directory:
+                with open(self._path(key), "w") as f:
+                    json.dump({"stored_at": now, "weights": weights}, f)
+
+            if self.table is not None:
+                self.table.put_item(Item={
+                    'ProfileHash': key,
+                    'Weights': json.dumps(weights),
+                    'ExpiresAt': int(now + (self.ttl or 10 * 365 * 86400))
+                })
+        except Exception as e:
+            print(f"Error storing cached weights: {e}")
+
+    def _delete_backing(self, key: str):
+        try:
+            if self.directory and os.path.exists(self._path(key)):
+                os.remove(self._path(key))
+            if self.table is not None:
+                self.table.delete_item(Key={'ProfileHash': key})
+        except Exception as e:
+            print(f"Error deleting cached weights: {e}")
+
+    def get(self, user: dict):
+        key = profile_hash(user.get('UserProfile'))
+        self._user_keys.set(user['UserID'], key)
+
+        weights = self._memory.get(key)
+        if weights is None:
+            weights = self._load_backing(key)
+            if weights is not None:
+                self._memory.set(key, weights)
+        return weights
+
+    def set(self, user: dict, weights: dict):
+        if not weights:
+            return
+        key = profile_hash(user.get('UserProfile'))
+        self._user_keys.set(user['UserID'], key)
+        self._memory.set(key, weights)
+        self._store_backing(key, weights)
+
+    # Function to drop a user's cached weights once their profile has changed
+    def invalidate(self, user_id: str, user_profile: dict):
+        old_key = self._user_keys.get(user_id)
+        if old_key is None or old_key == profile_hash(user_profile):
+            return
+
+        self._user_keys.pop(user_id)
+        self._memory.pop(old_key)
+        self._delete_backing(old_key)
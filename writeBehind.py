@@ -0,0 +1,122 @@
+import atexit
+import threading
+import time
+
+
+class WriteBehindQueue:
+    """
+    Queues DynamoDB puts off the request path and flushes them in batches.
+
+    A flush happens when flush_size items are pending or flush_interval
+    seconds have passed. Each flush goes through batch_writer, which
+    re-sends unprocessed items itself. A batch that still fails is
+    re-queued, up to max_attempts times. stop() (also registered with
+    atexit) flushes whatever is left.
+    """
+
+    def __init__(self, flush_size: int = 25, flush_interval: float = 1.0, max_attempts: int = 5):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.written = 0
+        self.retried = 0
+        self.dropped = 0
+        self._pending = {}
+        self._depth = 0
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._stopping = False
+        self._thread = None
+
+    def depth(self) -> int:
+        """
+        Number of writes queued but not yet flushed.
+        """
+        with self._condition:
+            return self._depth
+
+    def put(self, table, item: dict, key_names: list):
+        with self._condition:
+            queue = self._pending.setdefault(table.name, {"table": table, "key_names": key_names, "items": []})
+            queue["items"].append((item, 1))
+            self._depth += 1
+            if self._depth >= self.flush_size:
+                self._condition.notify()
+
+    def _flush_table(self, table, key_names: list, items: list) -> list:
+        try:
+            # overwrite_by_pkeys collapses repeated keys, matching put_item's last-write-wins
+            with table.batch_writer(overwrite_by_pkeys=key_names) as batch:
+                for item, _ in items:
+                    batch.put_item(Item=item)
+            self.written += len(items)
+            return []
+        except Exception as e:
+            print(f"Error flushing {len(items)} writes to {table.name}: {e}")
+
+        retry = []
+        for item, attempt in items:
+            if attempt >= self.max_attempts:
+                self.dropped += 1
+                print(f"Dropping write to {table.name} after {attempt} attempts: {item}")
+            else:
+                self.retried += 1
+                retry.append((item, attempt + 1))
+        return retry
+
+    # Function to write out everything queued so far; returns how many writes were re-queued
+    def flush(self) -> int:
+        requeued = 0
+        with self._flush_lock:
+            with self._condition:
+                pending, self._pending = self._pending, {}
+                self._depth = 0
+
+            for name, queue in pending.items():
+                retry = self._flush_table(queue["table"], queue["key_names"], queue["items"])
+                if retry:
+                    with self._condition:
+                        requeue = self._pending.setdefault(name, {**queue, "items": []})
+                        requeue["items"][:0] = retry
+                        self._depth += len(retry)
+                    requeued += len(retry)
+        return requeued
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if not self._stopping and self._depth < self.flush_size:
+                    self._condition.wait(self.flush_interval)
+                stopping = self._stopping
+            if stopping:
+                return
+            try:
+                requeued = self.flush()
+            except Exception as e:
+                print(f"Error in write-behind flush: {e}")
+                requeued = 0
+            if requeued:
+                # Back off a little while DynamoDB is rejecting writes
+                time.sleep(self.flush_interval)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    # Function to stop the flusher and write out what's left (shutdown hook)
+    def stop(self):
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval * 2)
+            self._thread = None
+
+        for _ in range(self.max_attempts):
+            if not self.depth():
+                break
+            self.flush()